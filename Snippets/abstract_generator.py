@@ -7,15 +7,10 @@ Difficulty: Beginner
 Tags: LLM, Abstract, Writing, Automation
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm, run_many, run_sync
 from langchain.prompts import PromptTemplate
 
-def generate_abstract(title: str, methods: str, results: dict):
-    """Generate paper abstract using LLM"""
-    
-    # Setup local LLM
-    llm = Ollama(model="llama2", temperature=0.7)
-    
+def _abstract_prompt(title: str, methods: str, results: dict) -> str:
     # Create prompt template
     template = """Write a structured academic abstract for a research paper:
 
@@ -42,18 +37,45 @@ Abstract:"""
     # Format results
     results_text = "\n".join([f"- {k}: {v}" for k, v in results.items()])
     
-    # Generate abstract
-    abstract = llm(prompt.format(
+    return prompt.format(
         title=title,
         methods=methods,
         results=results_text
-    ))
+    )
+
+def generate_abstract(title: str, methods: str, results: dict):
+    """Generate paper abstract using LLM"""
+    
+    # Setup local LLM
+    llm = get_llm("llama2", temperature=0.7)
+    
+    # Generate abstract
+    abstract = llm(_abstract_prompt(title, methods, results))
     
     print("✓ Generated abstract:")
     print(abstract)
     
     return abstract
 
+async def agenerate_abstract(title: str, methods: str, results: dict):
+    """Async counterpart of generate_abstract (no printing)"""
+    llm = get_llm("llama2", temperature=0.7)
+    return await llm.ainvoke(_abstract_prompt(title, methods, results))
+
+async def agenerate_abstract_many(papers: list, max_concurrency: int = 4):
+    """Abstracts for many papers, `max_concurrency` at a time
+    
+    `papers` are dicts with title, methods and results keys. Returns one
+    {'output', 'error', 'seconds'} dict per paper, in input order.
+    """
+    return await run_many(agenerate_abstract, papers, max_concurrency,
+                          label="abstracts")
+
+def generate_abstract_many(papers: list, max_concurrency: int = 4):
+    """Blocking agenerate_abstract_many (await that one inside Jupyter)"""
+    return run_sync(agenerate_abstract_many(papers, max_concurrency),
+                    "agenerate_abstract_many")
+
 # Usage
 abstract = generate_abstract(
     title="Novel Deep Learning Approach for Text Classification",
@@ -63,4 +85,12 @@ abstract = generate_abstract(
         "F1-Score": "0.93 (macro average)",
         "Improvement": "5% over SOTA baseline"
     }
-)
\ No newline at end of file
+)
+
+# Several drafts at once
+drafts = generate_abstract_many([
+    {'title': "Sparse Attention for Long Documents",
+     'methods': "Block-sparse transformer", 'results': {"ROUGE-L": "41.2"}},
+    {'title': "Distilled Retrieval Models",
+     'methods': "Teacher-student distillation", 'results': {"MRR@10": "0.38"}},
+], max_concurrency=4)
@@ -0,0 +1,86 @@
+"""
+Title: Semantic Answer Cache
+Subtitle: Instant answers to questions you already asked
+Date: 2024-11-24
+Category: AI Tools
+Difficulty: Intermediate
+Tags: LLM, RAG, Cache, Performance
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', question.lower()).strip().rstrip('?!. ')
+
+class AnswerCache:
+    """Persistent RAG answer cache keyed on question, retrieved chunks and model
+
+    Entries written under another `index_version` are dropped on open, so
+    re-indexing invalidates the cache. With `embed` and `threshold` set,
+    near-duplicate questions over the same chunks also hit.
+    """
+
+    def __init__(self, path: str = 'answer_cache.sqlite', index_version: str = '',
+                 embed=None, threshold: float = None):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS answers (
+            key TEXT PRIMARY KEY, context TEXT, question TEXT,
+            embedding BLOB, answer TEXT, index_version TEXT, created REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS by_context ON answers (context)")
+        self.conn.execute("DELETE FROM answers WHERE index_version != ?", (index_version,))
+        self.conn.commit()
+        self.index_version = index_version
+        self.embed = embed
+        self.threshold = threshold
+        self.lock = threading.Lock()  # connection is shared by worker threads
+
+    def _keys(self, question: str, chunk_ids: list, model: str):
+        context = hashlib.sha256(json.dumps([model, sorted(chunk_ids)]).encode()).hexdigest()
+        key = hashlib.sha256(f"{context}:{normalize_question(question)}".encode()).hexdigest()
+        return key, context
+
+    def get(self, question: str, chunk_ids: list, model: str):
+        """Return a cached answer or None"""
+        key, context = self._keys(question, chunk_ids, model)
+        with self.lock:
+            row = self.conn.execute("SELECT answer FROM answers WHERE key = ?",
+                                    (key,)).fetchone()
+        if row:
+            return row[0]
+
+        if self.embed is None or self.threshold is None:
+            return None
+        with self.lock:
+            rows = self.conn.execute("SELECT embedding, answer FROM answers "
+                                     "WHERE context = ? AND embedding IS NOT NULL",
+                                     (context,)).fetchall()
+        if not rows:
+            return None
+        query = np.asarray(self.embed(question), dtype=np.float32)
+        stored = np.vstack([np.frombuffer(r[0], dtype=np.float32) for r in rows])
+        sims = stored @ query / (np.linalg.norm(stored, axis=1) * np.linalg.norm(query) + 1e-12)
+        best = int(np.argmax(sims))
+        return rows[best][1] if sims[best] >= self.threshold else None
+
+    def put(self, question: str, chunk_ids: list, model: str, answer: str):
+        key, context = self._keys(question, chunk_ids, model)
+        embedding = (np.asarray(self.embed(question), dtype=np.float32).tobytes()
+                     if self.embed is not None else None)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (key, context, question, embedding, answer,
+                               self.index_version, time.time()))
+            self.conn.commit()
+
+# Usage
+if __name__ == "__main__":
+    cache = AnswerCache('demo_cache.sqlite', index_version='v1')
+    cache.put("What is the main contribution?", ['c1', 'c2'], 'llama2', "A new method.")
+    print(cache.get("what is the main contribution", ['c2', 'c1'], 'llama2'))
@@ -8,56 +8,126 @@ Tags: BibTeX, Bibliography, Formatting, Journals
 """
 
 import bibtexparser
+import re
+from bibtexparser.bparser import BibTexParser
 from bibtexparser.bwriter import BibTexWriter
 from bibtexparser.bibdatabase import BibDatabase
 
-def format_bibliography(bib_file: str, style: str = 'ieee'):
-    """Format bibliography according to journal style"""
-    
-    # Load bibliography
-    with open(bib_file) as f:
-        bib_db = bibtexparser.load(f)
-    
-    # Style-specific formatting
-    for entry in bib_db.entries:
-        
-        if style == 'ieee':
-            # IEEE style: abbreviated names, no DOI
-            if 'doi' in entry:
-                del entry['doi']
-            if 'url' in entry:
-                del entry['url']
-                
-        elif style == 'apa':
-            # APA style: full names, include DOI
-            if 'doi' not in entry and 'url' in entry:
-                entry['doi'] = entry['url'].split('doi.org/')[-1]
-        
-        elif style == 'nature':
-            # Nature style: minimal fields
-            keep_fields = ['author', 'title', 'journal', 'year', 'volume', 'pages']
-            entry_keys = list(entry.keys())
-            for key in entry_keys:
-                if key not in keep_fields and key != 'ID' and key != 'ENTRYTYPE':
-                    del entry[key]
-        
-        # Clean up author field
-        if 'author' in entry:
-            entry['author'] = entry['author'].replace('\n', ' ')
-    
-    # Save formatted bibliography
+def _apply_style(entry: dict, style: str) -> dict:
+    """Return a copy of `entry` formatted for one journal style"""
+    entry = dict(entry)
+
+    if style == 'ieee':
+        # IEEE style: abbreviated names, no DOI
+        if 'doi' in entry:
+            del entry['doi']
+        if 'url' in entry:
+            del entry['url']
+
+    elif style == 'apa':
+        # APA style: full names, include DOI
+        if 'doi' not in entry and 'url' in entry:
+            entry['doi'] = entry['url'].split('doi.org/')[-1]
+
+    elif style == 'nature':
+        # Nature style: minimal fields
+        keep_fields = ['author', 'title', 'journal', 'year', 'volume', 'pages']
+        entry_keys = list(entry.keys())
+        for key in entry_keys:
+            if key not in keep_fields and key != 'ID' and key != 'ENTRYTYPE':
+                del entry[key]
+
+    # Clean up author field
+    if 'author' in entry:
+        entry['author'] = entry['author'].replace('\n', ' ')
+
+    return entry
+
+def _writer(sort: bool = True) -> BibTexWriter:
     writer = BibTexWriter()
     writer.indent = '  '
-    writer.order_entries_by = ('year', 'author')
-    
-    output_file = bib_file.replace('.bib', f'_{style}.bib')
-    with open(output_file, 'w') as f:
-        f.write(writer.write(bib_db))
-    
-    print(f"✓ Formatted {len(bib_db.entries)} entries")
-    print(f"✓ Saved to {output_file}")
-    print(f"📚 Style: {style.upper()}")
+    writer.order_entries_by = ('year', 'author') if sort else None
+    return writer
+
+def _iter_entries(bib_file: str):
+    """Yield entries one at a time without loading the whole file"""
+    parser = BibTexParser(common_strings=True)
+    parser.expect_multiple_parse = True  # keeps @string macros across chunks
+
+    def flush(chunk):
+        parser.parse(''.join(chunk))
+        entries = parser.bib_database.entries
+        parser.bib_database.entries = []
+        return entries
+
+    chunk, depth = [], 0
+    with open(bib_file) as f:
+        for line in f:
+            # '@' only starts an entry outside braces, not inside a field value
+            if depth <= 0 and line.lstrip().startswith('@') and chunk:
+                yield from flush(chunk)
+                chunk, depth = [], 0
+            chunk.append(line)
+            unescaped = re.sub(r'\\[{}]', '', line)
+            depth += unescaped.count('{') - unescaped.count('}')
+    if chunk:
+        yield from flush(chunk)
+
+def format_bibliography_multi(bib_file: str, styles: list, stream: bool = False):
+    """Parse once and write one formatted file per style
+
+    With `stream=True` entries are parsed, formatted and written one at a
+    time, so memory stays flat; output then keeps the input order instead
+    of sorting by year and author.
+    """
+
+    outputs = {style: bib_file.replace('.bib', f'_{style}.bib') for style in styles}
+
+    if stream:
+        files = {style: open(path, 'w') for style, path in outputs.items()}
+        writer = _writer(sort=False)
+        count = 0
+        try:
+            for entry in _iter_entries(bib_file):
+                for style, f in files.items():
+                    single = BibDatabase()
+                    single.entries = [_apply_style(entry, style)]
+                    f.write(('\n' if count else '') + writer.write(single))
+                count += 1
+        finally:
+            for f in files.values():
+                f.close()
+    else:
+        # Load bibliography
+        with open(bib_file) as f:
+            bib_db = bibtexparser.load(f)
+
+        formatted = {style: BibDatabase() for style in styles}
+        for entry in bib_db.entries:
+            for style in styles:
+                formatted[style].entries.append(_apply_style(entry, style))
+
+        writer = _writer()
+        for style, db in formatted.items():
+            with open(outputs[style], 'w') as f:
+                f.write(writer.write(db))
+        count = len(bib_db.entries)
+
+    print(f"✓ Formatted {count} entries")
+    for style, path in outputs.items():
+        print(f"✓ Saved to {path} (📚 Style: {style.upper()})")
+
+    return outputs
+
+def format_bibliography(bib_file: str, style: str = 'ieee'):
+    """Format bibliography according to journal style"""
+    return format_bibliography_multi(bib_file, [style])[style]
 
 # Usage
 format_bibliography('references.bib', style='ieee')
-format_bibliography('references.bib', style='nature')
\ No newline at end of file
+
+# Several styles from a single parse
+format_bibliography_multi('references.bib', styles=['ieee', 'nature', 'apa'])
+
+# Very large files: constant memory, one pass
+format_bibliography_multi('references.bib', styles=['ieee', 'nature'], stream=True)
@@ -8,31 +8,108 @@ Tags: ArXiv, Download, Bulk, Automation
 """
 
 import arxiv
+import hashlib
+import json
+import re
 from pathlib import Path
 
-def download_papers(arxiv_ids: list, output_dir: str = 'papers'):
-    """Download multiple ArXiv papers by ID"""
-    
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _is_verified(record: dict, output_dir: str) -> bool:
+    """True if the manifest record's file is on disk with matching size and hash
+
+    The file is only re-hashed when its mtime differs from the recorded one.
+    """
+    path = Path(output_dir) / record['file']
+    if not path.exists():
+        return False
+    stat = path.stat()
+    if stat.st_size != record['size']:
+        return False
+    if stat.st_mtime == record.get('mtime'):
+        return True
+    if _sha256(path) != record['sha256']:
+        return False
+    record['mtime'] = stat.st_mtime  # verified: skip hashing on the next run
+    return True
+
+def download_papers(arxiv_ids: list, output_dir: str = 'papers',
+                    batch_size: int = 100):
+    """Download multiple ArXiv papers by ID
+
+    IDs are resolved `batch_size` at a time and every file is recorded in
+    `<output_dir>/manifest.json` (version, size, mtime, SHA-256), so reruns
+    only download new, updated or corrupted papers. Files whose size and
+    mtime are unchanged are trusted without re-hashing.
+    """
+
     Path(output_dir).mkdir(exist_ok=True)
-    
-    for paper_id in arxiv_ids:
+    manifest_path = Path(output_dir) / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    client = arxiv.Client(page_size=batch_size)
+    skipped = 0
+
+    for i in range(0, len(arxiv_ids), batch_size):
+        batch = arxiv_ids[i:i + batch_size]
+
         try:
-            # Get paper info
-            search = arxiv.Search(id_list=[paper_id])
-            paper = next(search.results())
-            
-            # Create filename from title
-            safe_title = "".join(c for c in paper.title 
-                               if c.isalnum() or c in (' ', '-'))[:50]
-            filename = f"{output_dir}/{paper_id}_{safe_title}.pdf"
-            
-            # Download
-            paper.download_pdf(filename=filename)
-            print(f"✓ {paper.title[:60]}")
-            
+            # Get paper info for the whole batch in one round trip
+            search = arxiv.Search(id_list=batch, max_results=len(batch))
+            papers = list(client.results(search))
         except Exception as e:
-            print(f"✗ Failed: {paper_id} ({e})")
+            print(f"✗ Failed batch {i // batch_size} ({e})")
+            continue
+
+        found = set()
+        for paper in papers:
+            paper_id, version = re.match(r'(.+?)(v\d+)?$',
+                                         paper.get_short_id()).groups()
+            found.add(paper_id)
+
+            record = manifest.get(paper_id)
+            if (record and record['version'] == version
+                    and _is_verified(record, output_dir)):
+                skipped += 1
+                continue
+
+            try:
+                # Create filename from title
+                safe_title = "".join(c for c in paper.title
+                                   if c.isalnum() or c in (' ', '-'))[:50]
+                filename = f"{paper_id.replace('/', '_')}_{safe_title}.pdf"
+
+                # Download
+                paper.download_pdf(dirpath=output_dir, filename=filename)
+                path = Path(output_dir) / filename
+                stat = path.stat()
+                manifest[paper_id] = {
+                    'version': version,
+                    'file': filename,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'sha256': _sha256(path)
+                }
+                print(f"✓ {paper.title[:60]}")
+
+            except Exception as e:
+                print(f"✗ Failed: {paper_id} ({e})")
+
+        for requested in batch:
+            if re.sub(r'v\d+$', '', requested) not in found:
+                print(f"✗ Failed: {requested} (not found)")
+
+        # Persist after every batch so an interrupted sync keeps its progress
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    print(f"\n✓ {skipped} already up to date, manifest: {manifest_path}")
+    return manifest
 
 # Usage - download multiple papers
 papers = ['2310.06825', '2303.08774', '2307.09288']
-download_papers(papers)
\ No newline at end of file
+download_papers(papers)
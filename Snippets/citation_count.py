@@ -7,26 +7,133 @@ Difficulty: Beginner
 Tags: Citations, Metrics, SemanticScholar, Impact
 """
 
+import json
+import re
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+API = "https://api.semanticscholar.org/graph/v1/paper"
+FIELDS = 'title,citationCount,year,authors'
+
+class RateLimiter:
+    """Minimum interval between requests, shared by all threads"""
+
+    def __init__(self, per_second: float = 1.0):
+        self.interval = 1.0 / per_second
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+# One limiter for the whole process so concurrent batches share the quota
+limiter = RateLimiter(per_second=1.0)
+session = requests.Session()
+
+def _request(method: str, url: str, retries: int = 4, **kwargs):
+    """Rate-limited request that backs off on HTTP 429"""
+    for attempt in range(retries + 1):
+        limiter.wait()
+        response = session.request(method, url, timeout=30, **kwargs)
+        if response.status_code != 429 or attempt == retries:
+            return response
+        time.sleep(2 ** attempt)
+
+def _metrics(paper: dict):
+    year = paper.get('year')
+    citations = paper.get('citationCount') or 0
+    return {
+        'title': paper['title'],
+        'citations': citations,
+        'year': year,
+        'cites_per_year': citations / (date.today().year - year + 1) if year else None
+    }
+
+def _as_paper_id(text: str):
+    """Map a DOI, arXiv ID or S2 ID to the Graph API's ID syntax, else None"""
+    text = text.strip()
+    if re.fullmatch(r'[0-9a-f]{40}', text) or re.match(r'(DOI|ARXIV|CorpusId|PMID):', text):
+        return text
+    if re.match(r'10\.\d{4,9}/\S+$', text):
+        return f'DOI:{text}'
+    if re.fullmatch(r'\d{4}\.\d{4,5}(v\d+)?', text):
+        return f'ARXIV:{text}'
+    return None
 
 def get_citation_count(paper_title: str):
     """Get citation count from Semantic Scholar"""
-    url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    response = requests.get(url, params={
-        'query': paper_title,
-        'fields': 'title,citationCount,year,authors'
-    })
-    
-    if response.ok and response.json()['data']:
-        paper = response.json()['data'][0]
-        return {
-            'title': paper['title'],
-            'citations': paper['citationCount'],
-            'year': paper['year'],
-            'cites_per_year': paper['citationCount'] / (2024 - paper['year'] + 1)
-        }
+    response = _request('GET', f"{API}/search",
+                        params={'query': paper_title, 'fields': FIELDS, 'limit': 1})
+
+    data = response.json().get('data') if response.ok else None
+    if data:
+        return _metrics(data[0])
+
+def get_citation_counts(titles_or_ids: list, cache_file: str = 'citation_cache.json',
+                        max_age_hours: float = 24, workers: int = 4):
+    """Get metrics for many papers, keyed by input in input order
+
+    Known IDs (DOI, arXiv, S2) go through the batch endpoint, 500 per call;
+    only titles fall back to search, run on `workers` threads. Results
+    younger than `max_age_hours` are served from `cache_file`.
+    """
+    path = Path(cache_file)
+    cache = json.loads(path.read_text()) if path.exists() else {}
+    fresh = time.time() - max_age_hours * 3600
+
+    results = {}
+    for item in titles_or_ids:
+        cached = cache.get(item)
+        if cached and cached['fetched'] > fresh:
+            results[item] = cached['metrics']
+
+    pending = [item for item in titles_or_ids if item not in results]
+    ids = {item: _as_paper_id(item) for item in pending}
+    known = [item for item in pending if ids[item]]
+    titles = [item for item in pending if not ids[item]]
+
+    for i in range(0, len(known), 500):
+        batch = known[i:i + 500]
+        response = _request('POST', f"{API}/batch", params={'fields': FIELDS},
+                            json={'ids': [ids[item] for item in batch]})
+        if not response.ok:
+            print(f"✗ Batch lookup failed ({response.status_code})")
+            continue
+        for item, paper in zip(batch, response.json()):
+            results[item] = _metrics(paper) if paper else None
+
+    def search(title):
+        try:
+            return get_citation_count(title)
+        except requests.RequestException as e:
+            print(f"✗ {title[:60]} ({e})")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for title, metrics in zip(titles, pool.map(search, titles)):
+            results[title] = metrics
+
+    now = time.time()
+    for item in pending:
+        if results.get(item) is not None:
+            cache[item] = {'fetched': now, 'metrics': results[item]}
+    path.write_text(json.dumps(cache, indent=2))
+
+    return {item: results.get(item) for item in titles_or_ids}
 
 # Usage
 metrics = get_citation_count("Attention is All You Need")
 print(f"📊 {metrics['citations']} citations")
-print(f"📈 {metrics['cites_per_year']:.1f} citations/year")
\ No newline at end of file
+print(f"📈 {metrics['cites_per_year']:.1f} citations/year")
+
+dashboard = get_citation_counts(["Attention is All You Need",
+                                 "10.1038/nature14539", "1810.04805"])
+for paper, m in dashboard.items():
+    print(f"  {paper[:40]}: {m['citations'] if m else 'not found'}")
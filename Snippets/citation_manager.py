@@ -7,15 +7,44 @@ Difficulty: Beginner
 Tags: BibTeX, Citations, References, Academic
 """
 
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
 import bibtexparser
 from bibtexparser.bwriter import BibTexWriter
 from bibtexparser.bibdatabase import BibDatabase
 
+SEARCH_FIELDS = ('title', 'author', 'abstract', 'keywords')
+
+def _strip_version(arxiv_id: str) -> str:
+    return re.sub(r'v\d+$', '', arxiv_id.strip())
+
+def _stem(word: str) -> str:
+    """Light plural stripping so 'transformer' matches 'Transformers'"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+def _tokenize(text: str) -> list:
+    return [_stem(word) for word in re.findall(r'\w+', text.lower())]
+
 class CitationManager:
-    def __init__(self, bib_file: str = 'references.bib'):
+    def __init__(self, bib_file: str = 'references.bib', compact_every: int = 1000):
         self.bib_file = bib_file
+        self.compact_every = compact_every
+        self.appended = 0
+        self.by_id, self.by_doi, self.by_eprint = {}, {}, {}
+        # Inverted index: term -> {position in db.entries: term frequency}
+        self.postings = defaultdict(dict)
+        self.doc_len = []
+        self.total_len = 0
         self.db = self._load_or_create()
-    
+        for entry in self.db.entries:
+            self._index(entry)
+
     def _load_or_create(self):
         """Load existing or create new bibliography"""
         try:
@@ -23,41 +52,129 @@ class CitationManager:
                 return bibtexparser.load(f)
         except FileNotFoundError:
             return BibDatabase()
-    
+
+    def _index(self, entry: dict):
+        self.by_id[entry['ID']] = entry
+        if entry.get('doi'):
+            self.by_doi[entry['doi'].lower()] = entry
+        if entry.get('eprint'):
+            self.by_eprint[_strip_version(entry['eprint'])] = entry
+
+        doc = len(self.doc_len)
+        terms = Counter(_tokenize(' '.join(entry.get(f, '') for f in SEARCH_FIELDS)))
+        for term, tf in terms.items():
+            self.postings[term][doc] = tf
+        self.doc_len.append(sum(terms.values()))
+        self.total_len += self.doc_len[-1]
+
+    def find_duplicate(self, entry: dict):
+        """Return the stored entry with the same ID, DOI or eprint, if any"""
+        return (self.by_id.get(entry['ID'])
+                or self.by_doi.get(entry.get('doi', '').lower())
+                or self.by_eprint.get(_strip_version(entry.get('eprint', ''))))
+
     def add_arxiv_paper(self, arxiv_id: str):
         """Add paper from ArXiv ID"""
+        return self.add_arxiv_papers([arxiv_id])
+
+    def add_arxiv_papers(self, arxiv_ids: list):
+        """Add many ArXiv papers with one batched search and one write"""
         import arxiv
-        
-        search = arxiv.Search(id_list=[arxiv_id])
-        paper = next(search.results())
-        
-        entry = {
-            'ENTRYTYPE': 'article',
-            'ID': arxiv_id.replace('.', '_'),
-            'title': paper.title,
-            'author': ' and '.join([a.name for a in paper.authors]),
-            'year': str(paper.published.year),
-            'journal': 'arXiv preprint',
-            'eprint': arxiv_id,
-            'archivePrefix': 'arXiv'
-        }
-        
-        self.db.entries.append(entry)
+
+        new_ids = list(dict.fromkeys(_strip_version(i) for i in arxiv_ids
+                                     if _strip_version(i) not in self.by_eprint))
+        if not new_ids:
+            return []
+
+        search = arxiv.Search(id_list=new_ids, max_results=len(new_ids))
+        client = arxiv.Client(page_size=100)
+
+        added = []
+        for paper in client.results(search):
+            eprint = _strip_version(paper.get_short_id())
+            entry = {
+                'ENTRYTYPE': 'article',
+                'ID': eprint.replace('.', '_').replace('/', '_'),
+                'title': paper.title,
+                'author': ' and '.join([a.name for a in paper.authors]),
+                'year': str(paper.published.year),
+                'journal': 'arXiv preprint',
+                'eprint': eprint,
+                'archivePrefix': 'arXiv'
+            }
+            if paper.doi:
+                entry['doi'] = paper.doi
+
+            if self.find_duplicate(entry) is None:
+                self.db.entries.append(entry)
+                self._index(entry)
+                added.append(entry)
+
+        self._append(added)
+        return added
+
+    def _append(self, entries: list):
+        """Append new entries to the file; compact every `compact_every` adds"""
+        if not entries:
+            return
+        self.appended += len(entries)
+        if self.appended >= self.compact_every:
+            self.compact()
+            return
+
+        chunk = BibDatabase()
+        chunk.entries = entries
+        with open(self.bib_file, 'a') as f:
+            f.write('\n' + BibTexWriter().write(chunk))
+
+    def compact(self):
+        """Rewrite the whole bibliography in canonical (sorted) form"""
         self._save()
-    
+        self.appended = 0
+
     def _save(self):
         """Save bibliography to file"""
         writer = BibTexWriter()
         with open(self.bib_file, 'w') as f:
             f.write(writer.write(self.db))
-    
-    def search(self, keyword: str):
-        """Search entries by keyword"""
-        results = [e for e in self.db.entries 
-                  if keyword.lower() in e.get('title', '').lower()]
-        return results
+
+    def search(self, keyword: str, n: int = 20, year_from: int = None,
+               year_to: int = None, k1: float = 1.5, b: float = 0.75):
+        """BM25-ranked search over title, author, abstract and keywords
+
+        Plurals are folded; a query term with no exact match falls back to
+        every indexed term it is a prefix of (e.g. 'transform').
+        """
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs or 1
+
+        scores = defaultdict(float)
+        for query_term in set(_tokenize(keyword)):
+            terms = ([query_term] if query_term in self.postings else
+                     [t for t in self.postings if t.startswith(query_term)])
+            for term in terms:
+                postings = self.postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    norm = k1 * (1 - b + b * self.doc_len[doc] / avg_len)
+                    scores[doc] += idf * tf * (k1 + 1) / (tf + norm)
+
+        def in_range(entry):
+            year = entry.get('year', '')
+            if not year.isdigit():
+                return year_from is None and year_to is None
+            return ((year_from is None or int(year) >= year_from)
+                    and (year_to is None or int(year) <= year_to))
+
+        candidates = [doc for doc in scores if in_range(self.db.entries[doc])]
+        top = heapq.nlargest(n, candidates, key=scores.__getitem__)
+        return [self.db.entries[doc] for doc in top]
 
 # Usage
 manager = CitationManager()
 manager.add_arxiv_paper('2310.06825')  # Add a paper
-matches = manager.search('transformer')
\ No newline at end of file
+manager.add_arxiv_papers(['2303.08774', '2307.09288'])  # One search, one write
+matches = manager.search('transformer')
+recent = manager.search('large language model', year_from=2023)
@@ -11,50 +11,154 @@ from langchain.llms import Ollama
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 import bibtexparser
+import hashlib
+import numpy as np
+import re
 
-def build_citation_database(bib_file: str):
-    """Build searchable citation database"""
+def _entry_key(entry: dict) -> str:
+    """Content hash of an entry's key, title and abstract"""
+    text = f"{entry.get('ID', '')}\n{entry.get('title', '')}\n{entry.get('abstract', '')}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def build_citation_database(bib_file: str, persist_dir: str = './citation_db'):
+    """Build searchable citation database
+
+    The Chroma store is persisted in `persist_dir` with one document per
+    entry content hash, so rebuilds only embed new or edited entries and
+    drop deleted ones. Unchanged entries whose other fields (author, year,
+    ...) were edited get their metadata refreshed without re-embedding.
+    """
     
     # Parse BibTeX
     with open(bib_file) as f:
         bib_db = bibtexparser.load(f)
     
     # Create documents from entries
-    docs = []
+    docs = {}
     for entry in bib_db.entries:
         text = f"{entry.get('title', '')} {entry.get('abstract', '')}"
-        docs.append({
+        docs[_entry_key(entry)] = {
             'text': text,
             'metadata': entry
-        })
+        }
     
-    # Create vector store
+    # Open (or create) the persistent vector store
     embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    texts = [d['text'] for d in docs]
-    metadatas = [d['metadata'] for d in docs]
+    vectorstore = Chroma(collection_name="citations",
+                         embedding_function=embeddings,
+                         persist_directory=persist_dir)
     
-    vectorstore = Chroma.from_texts(texts, embeddings, metadatas=metadatas)
+    stored = vectorstore.get(include=['metadatas'])
+    existing = dict(zip(stored['ids'], stored['metadatas']))
+    new = [key for key in docs if key not in existing]
+    stale = [key for key in existing if key not in docs]
+    edited = [key for key in docs
+              if key in existing and existing[key] != docs[key]['metadata']]
     
-    print(f"✓ Indexed {len(docs)} papers")
+    if edited:
+        vectorstore._collection.update(
+            ids=edited, metadatas=[docs[k]['metadata'] for k in edited])
+    if stale:
+        vectorstore.delete(ids=stale)
+    if new:
+        texts = [docs[k]['text'] for k in new]
+        metadatas = [docs[k]['metadata'] for k in new]
+        vectorstore.add_texts(texts, metadatas=metadatas, ids=new)
+    if new or stale or edited:
+        vectorstore.persist()
+    
+    print(f"✓ Indexed {len(docs)} papers ({len(new)} embedded, "
+          f"{len(edited)} updated, {len(stale)} removed)")
     return vectorstore
 
+def _suggestion(meta: dict) -> dict:
+    citation = f"{meta.get('author', 'Unknown')} ({meta.get('year', 'N/A')})"
+    return {
+        'citation': citation,
+        'title': meta.get('title', 'N/A'),
+        'key': meta.get('ID', 'N/A')
+    }
+
 def suggest_citations(text: str, vectorstore, n: int = 5):
     """Suggest relevant citations for a text passage"""
     
     # Find similar papers
     results = vectorstore.similarity_search(text, k=n)
     
-    suggestions = []
-    for doc in results:
-        meta = doc.metadata
-        citation = f"{meta.get('author', 'Unknown')} ({meta.get('year', 'N/A')})"
-        suggestions.append({
-            'citation': citation,
-            'title': meta.get('title', 'N/A'),
-            'key': meta.get('ID', 'N/A')
+    return [_suggestion(doc.metadata) for doc in results]
+
+def _split_tex(tex_path: str, unit: str = 'paragraph'):
+    """Yield (line_number, text) for each paragraph or sentence of a .tex file"""
+    
+    def blocks():
+        start, lines = None, []
+        with open(tex_path) as f:
+            for number, line in enumerate(f, 1):
+                line = re.sub(r'(?<!\\)%.*', '', line).strip()
+                if line:
+                    start = start or number
+                    lines.append(line)
+                elif lines:
+                    yield start, lines
+                    start, lines = None, []
+        if lines:
+            yield start, lines
+    
+    for start, lines in blocks():
+        text = ' '.join(lines)
+        if unit == 'sentence':
+            # Character offset where each source line starts in `text`
+            offsets = np.cumsum([0] + [len(line) + 1 for line in lines[:-1]])
+            for match in re.finditer(r'[^.!?]+[.!?]*', text):
+                # Skip the joining space, which belongs to the previous line
+                first = match.start() + len(match.group()) - len(match.group().lstrip())
+                line = np.searchsorted(offsets, first, side='right') - 1
+                yield start + int(line), match.group().strip()
+        else:
+            yield start, text
+
+def suggest_for_document(tex_path: str, vectorstore, n: int = 3,
+                         unit: str = 'paragraph', batch_size: int = 256,
+                         min_words: int = 8):
+    """Suggest citations for every paragraph (or sentence) of a manuscript
+
+    All passages are embedded in batches and scored against the whole
+    entry matrix with one matrix product instead of one search each.
+    """
+    
+    passages = [(line, text) for line, text in _split_tex(tex_path, unit)
+                if len(re.sub(r'\\\w+(\{[^}]*\})?', '', text).split()) >= min_words]
+    if not passages:
+        return []
+    
+    # Entry matrix straight from the store, no re-embedding
+    stored = vectorstore.get(include=['embeddings', 'metadatas'])
+    if not stored['ids']:
+        return []
+    entries = np.asarray(stored['embeddings'], dtype=np.float32)
+    entries /= np.linalg.norm(entries, axis=1, keepdims=True) + 1e-12
+    
+    embed = vectorstore.embeddings.embed_documents
+    texts = [text for _, text in passages]
+    queries = np.vstack([np.asarray(embed(texts[i:i + batch_size]), dtype=np.float32)
+                         for i in range(0, len(texts), batch_size)])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+    
+    scores = queries @ entries.T
+    k = min(n, entries.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    
+    results = []
+    for row, (line, text) in enumerate(passages):
+        ranked = top[row][np.argsort(-scores[row, top[row]])]
+        results.append({
+            'line': line,
+            'text': text,
+            'suggestions': [dict(_suggestion(stored['metadatas'][i]),
+                                 score=float(scores[row, i])) for i in ranked]
         })
     
-    return suggestions
+    return results
 
 # Usage
 vectorstore = build_citation_database('references.bib')
@@ -64,4 +168,9 @@ suggestions = suggest_citations(text, vectorstore, n=3)
 
 print("💡 Suggested citations:")
 for s in suggestions:
-    print(f"  [{s['key']}] {s['citation']}: {s['title'][:60]}...")
\ No newline at end of file
+    print(f"  [{s['key']}] {s['citation']}: {s['title'][:60]}...")
+
+# Whole manuscript in one vectorized pass
+for hit in suggest_for_document('paper.tex', vectorstore, n=3):
+    keys = ', '.join(s['key'] for s in hit['suggestions'])
+    print(f"  L{hit['line']}: \\cite{{{keys}}}")
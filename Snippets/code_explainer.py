@@ -7,13 +7,13 @@ Difficulty: Beginner
 Tags: LLM, Code, Documentation, Methods
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 import ast
 
 def explain_code_for_paper(code_file: str):
     """Generate Methods section from research code"""
     
-    llm = Ollama(model="codellama")
+    llm = get_llm("codellama")
     
     # Read code
     with open(code_file, 'r') as f:
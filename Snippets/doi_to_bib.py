@@ -8,36 +8,130 @@ Tags: DOI, BibTeX, Citations, Automation
 """
 
 import requests
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def doi_to_bibtex(doi: str) -> str:
+# Point this (or the url= argument) at a local stand-in server to test
+# without hitting CrossRef; it is read at call time
+CROSSREF_URL = "https://api.crossref.org/works/{doi}/transform/application/x-bibtex"
+
+def normalize_doi(doi: str) -> str:
+    """Strip resolver prefixes and lowercase (DOIs are case-insensitive)"""
+    doi = doi.strip()
+    for prefix in ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'doi:'):
+        if doi.lower().startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi.lower()
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """Pooled session that retries 429/5xx with exponential backoff"""
+    retry = Retry(total=5, backoff_factor=0.5,
+                  status_forcelist=[429, 500, 502, 503, 504],
+                  respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class DOICache:
+    """SQLite cache of BibTeX by normalized DOI; NULL bibtex marks a 404"""
+
+    def __init__(self, path: str = 'doi_cache.sqlite',
+                 ttl_days: float = 30, negative_ttl_days: float = 1):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bib "
+                          "(doi TEXT PRIMARY KEY, bibtex TEXT, fetched REAL)")
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+
+    def get(self, doi: str):
+        """Return (hit, bibtex); bibtex is None for a cached 404"""
+        row = self.conn.execute("SELECT bibtex, fetched FROM bib WHERE doi = ?",
+                                (doi,)).fetchone()
+        if row is None:
+            return False, None
+        bibtex, fetched = row
+        ttl = self.ttl if bibtex is not None else self.negative_ttl
+        return time.time() - fetched < ttl, bibtex
+
+    def put(self, doi: str, bibtex):
+        self.conn.execute("INSERT OR REPLACE INTO bib VALUES (?, ?, ?)",
+                          (doi, bibtex, time.time()))
+        self.conn.commit()
+
+def _fetch(session, doi: str, url: str):
+    """Fetch one entry; None means CrossRef does not know the DOI"""
+    response = session.get((url or CROSSREF_URL).format(doi=doi), timeout=30)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.text
+
+def doi_to_bibtex(doi: str, session=None, url: str = None) -> str:
     """Convert DOI to BibTeX entry using CrossRef"""
-    
-    url = f"https://api.crossref.org/works/{doi}/transform/application/x-bibtex"
-    
-    response = requests.get(url)
-    
-    if response.ok:
-        return response.text
+
+    try:
+        bib = _fetch(session or requests, normalize_doi(doi), url)
+    except requests.RequestException:
+        bib = None
+
+    if bib is not None:
+        return bib
     else:
         return f"Error: Could not fetch BibTeX for {doi}"
 
-def batch_doi_to_bib(dois: list, output_file: str = 'references.bib'):
-    """Convert multiple DOIs to BibTeX file"""
-    
-    entries = []
-    for doi in dois:
-        bib = doi_to_bibtex(doi)
-        if not bib.startswith("Error"):
-            entries.append(bib)
+def batch_doi_to_bib(dois: list, output_file: str = 'references.bib',
+                     cache_file: str = 'doi_cache.sqlite', workers: int = 8,
+                     url: str = None):
+    """Convert multiple DOIs to BibTeX file
+
+    Cached entries are reused; the rest are fetched by `workers` threads
+    and written in input order as they complete.
+    """
+
+    cache = DOICache(cache_file)
+    session = make_session(workers)
+    keys = [normalize_doi(doi) for doi in dois]
+
+    cached = {}
+    for key in keys:
+        hit, bib = cache.get(key)
+        if hit:
+            cached[key] = bib
+
+    def resolve(key):
+        if key in cached:
+            return True, cached[key]
+        try:
+            return False, _fetch(session, key, url)
+        except requests.RequestException as e:
+            return False, e
+
+    count = 0
+    with open(output_file, 'w') as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() yields in input order, so the file is written as results arrive
+        for doi, key, (from_cache, bib) in zip(dois, keys, pool.map(resolve, keys)):
+            if isinstance(bib, Exception):
+                print(f"✗ {doi} ({bib})")
+                continue
+            if not from_cache:
+                cache.put(key, bib)
+            if bib is None:
+                print(f"✗ {doi}")
+                continue
+
+            f.write(('\n\n' if count else '') + bib.strip())
+            count += 1
             print(f"✓ {doi}")
-        else:
-            print(f"✗ {doi}")
-    
-    with open(output_file, 'w') as f:
-        f.write('\n\n'.join(entries))
-    
-    print(f"\n✓ Saved {len(entries)} entries to {output_file}")
+
+    session.close()
+    print(f"\n✓ Saved {count} entries to {output_file} ({len(cached)} from cache)")
 
 # Usage
 dois = ['10.1038/nature14539', '10.1126/science.aaa8415']
-batch_doi_to_bib(dois)
\ No newline at end of file
+batch_doi_to_bib(dois)
@@ -7,13 +7,13 @@ Difficulty: Intermediate
 Tags: LLM, Experiments, Planning, Agent
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 import json
 
 def suggest_next_experiments(previous_results: list, goal: str):
     """AI suggests next experiments based on results"""
     
-    llm = Ollama(model="llama2", temperature=0.8)
+    llm = get_llm("llama2", temperature=0.8)
     
     # Format previous results
     results_summary = "\n".join([
@@ -7,35 +7,133 @@ Difficulty: Intermediate
 Tags: LLM, Analysis, Gaps, Literature
 """
 
-from langchain.llms import Ollama
-from langchain.document_loaders import PyPDFLoader
+from llm_registry import ensure_max_in_flight, get_llm
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+from pdf_extract import default_cache, load_pdf_documents
 
-def find_research_gaps(paper_files: list):
-    """Analyze papers to identify research gaps"""
+# Bump when SUMMARY_PROMPT changes so cached summaries are regenerated
+SUMMARY_VERSION = 2
+SUMMARY_PROMPT = """Condense this research paper into a short structured summary:
+
+{text}
+
+Cover in 5-8 bullet points: problem, method, data, key results,
+stated limitations and future work.
+
+Summary:"""
+
+SECTION_PROMPT = """Condense part {part} of {parts} of a research paper into bullet points.
+Keep any problem, method, data, results, limitations and future work it mentions:
+
+{text}
+
+Notes:"""
+
+MERGE_PROMPT = """Merge these paper summaries into one condensed overview.
+Keep every distinct method, result, limitation and open question:
+
+{text}
+
+Overview:"""
+
+def _summarize_papers(llm, paper_files: list, workers: int, cache_file: str,
+                      max_chars: int):
+    """Map step: one condensed summary per paper, cached by content hash
+
+    Papers longer than `max_chars` are condensed section by section first,
+    so conclusions and limitations at the end reach the summary too.
+    """
+    path = Path(cache_file)
+    cache = json.loads(path.read_text()) if path.exists() else {}
+    keys = [f"{default_cache().file_hash(pdf)}:{llm.model}:{SUMMARY_VERSION}"
+            for pdf in paper_files]
+    
+    def summarize(pdf_file):
+        text = " ".join(d.page_content for d in load_pdf_documents(pdf_file))
+        parts = [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+        if len(parts) > 1:
+            notes = [llm(SECTION_PROMPT.format(part=i + 1, parts=len(parts), text=part))
+                     for i, part in enumerate(parts)]
+            text = _collapse(llm, notes, 1, max_chars)
+        return llm(SUMMARY_PROMPT.format(text=text[:max_chars]))
     
-    llm = Ollama(model="llama2", temperature=0.3)
+    todo = [(pdf, key) for pdf, key in zip(paper_files, keys) if key not in cache]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (pdf, key), summary in zip(todo, pool.map(summarize, [p for p, _ in todo])):
+            cache[key] = summary
+            path.write_text(json.dumps(cache, indent=2))
+            print(f"  ✓ Summarized {pdf}")
     
-    # Extract key info from papers
+    print(f"✓ {len(paper_files) - len(todo)} summaries from cache, {len(todo)} generated")
+    return [cache[key] for key in keys]
+
+def _collapse(llm, summaries: list, workers: int, max_chars: int) -> str:
+    """Reduce step: merge summaries in parallel groups until they fit one prompt"""
+    sep = "\n\n---\n\n"
+    while len(sep.join(summaries)) > max_chars and len(summaries) > 1:
+        groups, current = [], []
+        for summary in summaries:
+            if current and len(sep.join(current + [summary])) > max_chars:
+                groups.append(current)
+                current = []
+            current.append(summary)
+        groups.append(current)
+        if len(groups) == len(summaries):
+            # No two summaries fit together: merge pairs of halves so every
+            # paper still contributes and the list keeps shrinking
+            half = max_chars // 2
+            groups = [[summary[:half] for summary in summaries[i:i + 2]]
+                      for i in range(0, len(summaries), 2)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(
+                lambda g: llm(MERGE_PROMPT.format(text=sep.join(g))), groups))
+    return sep.join(summaries)
+
+def _first_and_last_pages(paper_files: list):
+    """Extract key info from papers (abstract and conclusion excerpts)"""
     papers_content = []
     for pdf_file in paper_files:
-        loader = PyPDFLoader(pdf_file)
-        pages = loader.load()
+        # Only the first and last pages are parsed (or read from the store)
+        first, last = load_pdf_documents(pdf_file, pages=[0, -1])
         
         # Get abstract and conclusion (usually first and last pages)
-        abstract = pages[0].page_content[:1000]
-        conclusion = pages[-1].page_content[:1000] if len(pages) > 1 else ""
+        abstract = first.page_content[:1000]
+        conclusion = last.page_content[:1000] if last.metadata['page'] > 0 else ""
         
         papers_content.append({
             'file': pdf_file,
             'content': f"{abstract}\n\n{conclusion}"
         })
+    return papers_content
+
+def find_research_gaps(paper_files: list, map_reduce: bool = False, workers: int = 4,
+                       summary_cache: str = 'gap_summaries.json',
+                       max_chars: int = 4000):
+    """Analyze papers to identify research gaps
+    
+    With `map_reduce=True` every paper is condensed from its full text
+    (section by section when long) by `workers` concurrent LLM calls,
+    cached per paper hash, and the gap analysis is synthesized from those
+    summaries, so no paper is dropped.
+    """
     
-    # Analyze for gaps
-    combined = "\n\n---\n\n".join([p['content'] for p in papers_content])
+    llm = get_llm("llama2", temperature=0.3)
+    
+    if map_reduce:
+        ensure_max_in_flight(workers)
+        summaries = _summarize_papers(llm, paper_files, workers, summary_cache,
+                                      max_chars=3 * max_chars)
+        combined = _collapse(llm, summaries, workers, max_chars)
+        papers_content = [{'file': pdf} for pdf in paper_files]
+    else:
+        papers_content = _first_and_last_pages(paper_files)
+        combined = "\n\n---\n\n".join([p['content'] for p in papers_content])
     
     prompt = f"""Analyze these research papers and identify gaps:
 
-{combined[:4000]}
+{combined[:max_chars]}
 
 Identify:
 1. What has been done (summary)
@@ -76,4 +174,7 @@ Based on the gaps identified, consider research in:
 
 # Usage
 papers = ['paper1.pdf', 'paper2.pdf', 'paper3.pdf']
-gaps = find_research_gaps(papers)
\ No newline at end of file
+gaps = find_research_gaps(papers)
+
+# Large literature sets: per-paper summaries in parallel, then synthesis
+gaps = find_research_gaps(papers, map_reduce=True, workers=4)
\ No newline at end of file
@@ -7,14 +7,10 @@ Difficulty: Beginner
 Tags: LLM, Hypothesis, Research, Ideas
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm, run_many, run_sync
 from langchain.prompts import PromptTemplate
 
-def generate_hypotheses(research_area: str, context: str, n: int = 5):
-    """Generate research hypotheses using LLM"""
-    
-    llm = Ollama(model="llama2", temperature=0.9)
-    
+def _hypotheses_prompt(research_area: str, context: str, n: int) -> str:
     template = """You are a creative research scientist.
 
 Research Area: {area}
@@ -40,17 +36,46 @@ Hypotheses:"""
         input_variables=["area", "context", "n"]
     )
     
-    hypotheses = llm(prompt.format(
+    return prompt.format(
         area=research_area,
         context=context,
         n=n
-    ))
+    )
+
+def generate_hypotheses(research_area: str, context: str, n: int = 5):
+    """Generate research hypotheses using LLM"""
+    
+    llm = get_llm("llama2", temperature=0.9)
+    
+    hypotheses = llm(_hypotheses_prompt(research_area, context, n))
     
     print(f"💡 Generated {n} hypotheses:\n")
     print(hypotheses)
     
     return hypotheses
 
+async def agenerate_hypotheses(research_area: str, context: str, n: int = 5):
+    """Async counterpart of generate_hypotheses (no printing)"""
+    llm = get_llm("llama2", temperature=0.9)
+    return await llm.ainvoke(_hypotheses_prompt(research_area, context, n))
+
+async def agenerate_hypotheses_many(areas: list, contexts: list, n: int = 5,
+                                    max_concurrency: int = 4):
+    """Hypotheses for many (area, context) pairs, `max_concurrency` at a time
+    
+    Returns one {'output', 'error', 'seconds'} dict per pair, in input order.
+    """
+    calls = [{'research_area': area, 'context': context, 'n': n}
+             for area, context in zip(areas, contexts, strict=True)]
+    return await run_many(agenerate_hypotheses, calls, max_concurrency,
+                          label="hypothesis sets")
+
+def generate_hypotheses_many(areas: list, contexts: list, n: int = 5,
+                             max_concurrency: int = 4):
+    """Blocking agenerate_hypotheses_many (await that one inside Jupyter)"""
+    return run_sync(agenerate_hypotheses_many(areas, contexts, n, max_concurrency),
+                    "agenerate_hypotheses_many")
+
 # Usage
 hypotheses = generate_hypotheses(
     research_area="Natural Language Processing",
@@ -58,4 +83,13 @@ hypotheses = generate_hypotheses(
     few-shot learning. However, they struggle with numerical reasoning 
     and require massive computational resources.""",
     n=3
-)
\ No newline at end of file
+)
+
+# Many areas at once: the Ollama server stays busy instead of idling
+results = generate_hypotheses_many(
+    areas=["Computer Vision", "Speech Recognition", "Robotics"],
+    contexts=["Self-supervised pretraining is closing the gap with labels.",
+              "End-to-end models dominate but fail on accented speech.",
+              "Sim-to-real transfer remains brittle."],
+    n=3, max_concurrency=4
+)
@@ -7,12 +7,12 @@ Difficulty: Beginner
 Tags: LLM, Keywords, NLP, Extraction
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 
 def extract_keywords(abstract: str, n: int = 5):
     """Extract keywords from abstract using LLM"""
     
-    llm = Ollama(model="llama2", temperature=0.3)
+    llm = get_llm("llama2", temperature=0.3)
     
     prompt = f"""Extract {n} most important keywords from this abstract:
 
@@ -34,7 +34,7 @@ List {n} keywords, comma-separated:"""
 def suggest_mesh_terms(abstract: str):
     """Suggest MeSH terms for biomedical papers"""
     
-    llm = Ollama(model="llama2", temperature=0.2)
+    llm = get_llm("llama2", temperature=0.2)
     
     prompt = f"""Suggest Medical Subject Headings (MeSH) terms for this abstract:
 
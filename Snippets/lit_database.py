@@ -7,71 +7,492 @@ Difficulty: Advanced
 Tags: RAG, Database, Search, Literature
 """
 
-from langchain.document_loaders import DirectoryLoader, PyPDFLoader
+import hashlib
+import json
+import math
+import os
+import pickle
+import re
+import signal
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.llms import Ollama
 from langchain.chains import RetrievalQA
+from langchain.schema import BaseRetriever, Document
+from typing import Any, List
+from answer_cache import AnswerCache
+from rag_utils import chunk_ids_of, record_stream_stats
+from pdf_extract import load_pdf_documents
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("PDF parsing timed out")
+
+def _load_pdf(path: str, timeout: int):
+    """Parse one PDF in a worker process, aborting after `timeout` seconds"""
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')  # POSIX only
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(timeout)
+    try:
+        # Reads through the shared text store: known content is never re-parsed
+        return load_pdf_documents(path)
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+def _load_isolated(path: str, timeout: int):
+    """Parse one PDF alone in a fresh worker; a crash only fails this file"""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(_load_pdf, path, timeout).result()
+        except Exception as e:
+            return e
+
+def parse_pdfs(paths: list, workers: int = None, timeout: int = 120):
+    """Parse PDFs across all cores, yielding (path, pages or exception)
+
+    At most two files per worker are in flight, so parsed pages never pile
+    up faster than the caller consumes them. If a worker process dies
+    (OOM kill, native crash), the files that were in flight are re-parsed
+    one at a time in isolation, so only the culprit fails, and the pool is
+    rebuilt for the rest.
+    """
+    workers = workers or os.cpu_count()
+    paths = iter(paths)
+    futures, suspects = {}, []
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def submit():
+        path = next(paths, None)
+        if path is not None:
+            try:
+                futures[pool.submit(_load_pdf, path, timeout)] = path
+            except BrokenProcessPool:
+                suspects.append(path)
+
+    try:
+        for _ in range(2 * workers):
+            submit()
+        while futures or suspects:
+            if futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = futures.pop(future)
+                    try:
+                        yield path, future.result()
+                    except BrokenProcessPool:
+                        suspects.append(path)
+                    except Exception as e:
+                        yield path, e
+                    submit()
+            if suspects:
+                # The whole pool is gone: every in-flight file is a suspect
+                suspects.extend(futures.values())
+                futures.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                for path in suspects:
+                    yield path, _load_isolated(path, timeout)
+                suspects.clear()
+                pool = ProcessPoolExecutor(max_workers=workers)
+                for _ in range(2 * workers):
+                    submit()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _tokenize(text: str) -> list:
+    return re.findall(r'\w+', text.lower())
+
+class BM25Index:
+    """Sparse BM25 index over chunk IDs, updated incrementally"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.postings = defaultdict(dict)  # term -> {chunk_id: tf}
+        self.terms = {}  # chunk_id -> its terms, so deletes touch only those postings
+        self.doc_len = {}
+        self.total_len = 0
+
+    def add(self, chunk_id: str, text: str):
+        terms = Counter(_tokenize(text))
+        for term, tf in terms.items():
+            self.postings[term][chunk_id] = tf
+        self.terms[chunk_id] = list(terms)
+        self.doc_len[chunk_id] = sum(terms.values())
+        self.total_len += self.doc_len[chunk_id]
+
+    def delete(self, chunk_ids: list):
+        for chunk_id in chunk_ids:
+            for term in self.terms.pop(chunk_id, ()):
+                postings = self.postings[term]
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+            self.total_len -= self.doc_len.pop(chunk_id, 0)
+
+    def save(self, path: Path):
+        # Plain containers only, so the file loads regardless of __main__;
+        # written aside and renamed so a kill mid-save can't truncate it
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(pickle.dumps((dict(self.postings), self.terms, self.doc_len)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        index = cls()
+        postings, index.terms, index.doc_len = pickle.loads(path.read_bytes())
+        index.postings.update(postings)
+        index.total_len = sum(index.doc_len.values())
+        return index
+
+    def search(self, query: str, n: int = 20) -> list:
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs or 1
+
+        scores = defaultdict(float)
+        for term in set(_tokenize(query)):
+            postings = self.postings.get(term, {})
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[chunk_id] / avg_len)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores, key=scores.get, reverse=True)[:n]
+
+class HybridRetriever(BaseRetriever):
+    """LangChain retriever backed by LiteratureDatabase.hybrid_search"""
+    db: Any
+    k: int = 5
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.db.hybrid_search(query, k=self.k)
 
 class LiteratureDatabase:
-    def __init__(self, papers_dir: str):
-        print("📚 Building literature database...")
-        
-        # Load all PDFs
-        loader = DirectoryLoader(papers_dir, glob="**/*.pdf", 
-                               loader_cls=PyPDFLoader)
-        documents = loader.load()
-        
-        # Split into chunks
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
+    def __init__(self, papers_dir: str, persist_dir: str = "./literature_db",
+                 parse_workers: int = None, parse_timeout: int = 120,
+                 batch_size: int = 256, reranker: str = None,
+                 rerank_budget_ms: float = 300, cache_threshold: float = None,
+                 manifest_interval: float = 30):
+        print("📚 Opening literature database...")
+
+        # Reopen the persisted vector store
+        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        self.vectorstore = Chroma(
+            collection_name="literature",
+            embedding_function=embeddings,
+            persist_directory=persist_dir
+        )
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
             chunk_overlap=200
         )
-        chunks = splitter.split_documents(documents)
-        
-        # Create vector store with persistence
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.vectorstore = Chroma.from_documents(
-            chunks, embeddings, persist_directory="./literature_db"
+
+        # Sync with the papers directory
+        self.manifest_path = Path(persist_dir) / "manifest.json"
+        self.manifest = (json.loads(self.manifest_path.read_text())
+                         if self.manifest_path.exists() else {})
+        self.parse_workers = parse_workers
+        self.parse_timeout = parse_timeout
+        self.batch_size = batch_size
+        self.manifest_interval = manifest_interval
+
+        # Sparse index over the same chunks; rebuilt if missing or out of
+        # step with the manifest (e.g. after an interrupted ingest)
+        self.bm25_path = Path(persist_dir) / "bm25.pkl"
+        chunk_ids = [c for r in self.manifest.values() for c in r['chunks']]
+        try:
+            self.bm25 = BM25Index.load(self.bm25_path)
+        except (FileNotFoundError, ValueError, EOFError, pickle.UnpicklingError):
+            self.bm25 = None  # missing, corrupt, or saved without per-chunk terms
+        if self.bm25 is None or set(self.bm25.doc_len) != set(chunk_ids):
+            self.bm25 = BM25Index()
+            # Chunk texts are fetched in batches so memory stays bounded
+            for i in range(0, len(chunk_ids), batch_size):
+                stored = self.vectorstore.get(ids=chunk_ids[i:i + batch_size],
+                                              include=['documents'])
+                for chunk_id, text in zip(stored['ids'], stored['documents']):
+                    self.bm25.add(chunk_id, text)
+            self.bm25_path.parent.mkdir(parents=True, exist_ok=True)
+            self.bm25.save(self.bm25_path)
+
+        added, removed = self._sync(papers_dir)
+
+        # Optional cross-encoder stage, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        self.reranker = None
+        if reranker:
+            from sentence_transformers import CrossEncoder
+            self.reranker = CrossEncoder(reranker)
+        self.rerank_budget_ms = rerank_budget_ms
+        self.timings = {}
+
+        # Answers are cached per index state: any ingest/delete invalidates them
+        chunk_ids = sorted(c for r in self.manifest.values() for c in r['chunks'])
+        self.answers = AnswerCache(
+            str(Path(persist_dir) / "answers.sqlite"),
+            index_version=hashlib.sha256(json.dumps(chunk_ids).encode()).hexdigest(),
+            # Only embed questions when near-duplicate lookup is on
+            embed=embeddings.embed_query if cache_threshold is not None else None,
+            threshold=cache_threshold
         )
-        
+
         # Setup QA chain
-        llm = Ollama(model="llama2")
+        self.llm = Ollama(model="llama2")
         self.qa = RetrievalQA.from_chain_type(
-            llm=llm,
+            llm=self.llm,
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5})
+            retriever=HybridRetriever(db=self, k=5)
         )
-        
-        print(f"✓ Indexed {len(chunks)} chunks from {len(documents)} papers")
-    
-    def query(self, question: str):
+
+        quarantined = sum('error' in r for r in self.manifest.values())
+        print(f"✓ {len(self.manifest) - quarantined} papers indexed "
+              f"({added} added or changed, {removed} removed, "
+              f"{quarantined} quarantined)")
+
+    def _delete_chunks(self, record: dict):
+        if record['chunks']:
+            self.vectorstore.delete(ids=record['chunks'])
+            self.bm25.delete(record['chunks'])
+
+    def _sync(self, papers_dir: str):
+        """Diff `papers_dir` against the manifest and apply only the changes
+
+        Files whose mtime and size match the manifest are not even hashed;
+        touched files with an unchanged hash are not re-embedded.
+        """
+        current = {str(p): p for p in sorted(Path(papers_dir).glob("**/*.pdf"))}
+
+        removed = [path for path in self.manifest if path not in current]
+        for path in removed:
+            self._delete_chunks(self.manifest.pop(path))
+
+        # Decide what needs (re)parsing before starting any workers
+        todo = {}
+        for path, pdf in current.items():
+            stat = pdf.stat()
+            record = self.manifest.get(path)
+            if record and (record['mtime'], record['size']) == (stat.st_mtime, stat.st_size):
+                continue
+
+            digest = _sha256(pdf)
+            if record and record['sha256'] == digest:
+                record.update(mtime=stat.st_mtime, size=stat.st_size)
+                continue
+            todo[path] = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                          'sha256': digest, 'chunks': []}
+
+        # Stream: parse -> split -> embed/upsert in fixed-size batches.
+        # Manifest records are committed only once all their chunks are stored,
+        # and the file is rewritten at most every `manifest_interval` seconds;
+        # after a crash, files missing from it are simply re-ingested.
+        added = 0
+        batch_docs, batch_ids, waiting = [], [], {}
+        last_save = time.monotonic()
+
+        def flush(final: bool = False):
+            nonlocal last_save
+            if batch_docs:
+                self.vectorstore.add_documents(batch_docs, ids=batch_ids)
+                batch_docs.clear()
+                batch_ids.clear()
+            self.manifest.update(waiting)
+            waiting.clear()
+            if final or time.monotonic() - last_save >= self.manifest_interval:
+                self._save_manifest()
+                last_save = time.monotonic()
+
+        for path, pages in parse_pdfs(list(todo), self.parse_workers, self.parse_timeout):
+            record = todo[path]
+            if path in self.manifest:
+                self._delete_chunks(self.manifest.pop(path))
+
+            if isinstance(pages, Exception):
+                # Quarantined: skipped until the file changes on disk
+                record['error'] = repr(pages)
+                waiting[path] = record
+                print(f"  ✗ {Path(path).name} quarantined ({pages!r})")
+                continue
+
+            # IDs are unique per (path, content) so duplicate PDFs don't collide
+            key = hashlib.sha256(f"{path}:{record['sha256']}".encode()).hexdigest()[:16]
+            for i, chunk in enumerate(self.splitter.split_documents(pages)):
+                chunk_id = f"{key}-{i}"
+                chunk.metadata['chunk_id'] = chunk_id
+                self.bm25.add(chunk_id, chunk.page_content)
+                record['chunks'].append(chunk_id)
+                batch_docs.append(chunk)
+                batch_ids.append(chunk_id)
+                if len(batch_docs) >= self.batch_size:
+                    flush()
+            del pages
+
+            waiting[path] = record
+            added += 1
+            print(f"  + {Path(path).name} ({len(record['chunks'])} chunks)")
+
+        flush(final=True)
+        if added or removed:
+            self.vectorstore.persist()
+            self.bm25.save(self.bm25_path)
+        return added, len(removed)
+
+    def hybrid_search(self, query: str, k: int = 5, candidates: int = 20,
+                      rrf_k: int = 60) -> List[Document]:
+        """Dense + BM25 retrieval fused with reciprocal rank fusion
+
+        If a reranker is configured, fused candidates are re-scored by the
+        cross-encoder until `rerank_budget_ms` is spent. Per-stage times
+        (ms) are left in `self.timings`.
+        """
+        timings = {}
+        start = time.perf_counter()
+        dense = self.vectorstore.similarity_search(query, k=candidates)
+        timings['dense'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        sparse = self.bm25.search(query, n=candidates)
+        timings['sparse'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        docs = {doc.metadata.get('chunk_id', doc.page_content): doc for doc in dense}
+        scores = defaultdict(float)
+        for ranking in ([doc.metadata.get('chunk_id', doc.page_content) for doc in dense],
+                        sparse):
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] += 1 / (rrf_k + rank + 1)
+
+        missing = [chunk_id for chunk_id in sparse if chunk_id not in docs]
+        if missing:
+            stored = self.vectorstore.get(ids=missing, include=['documents', 'metadatas'])
+            for chunk_id, text, meta in zip(stored['ids'], stored['documents'],
+                                            stored['metadatas']):
+                docs[chunk_id] = Document(page_content=text, metadata=meta)
+        fused = [docs[c] for c in sorted(scores, key=scores.get, reverse=True) if c in docs]
+        timings['fusion'] = (time.perf_counter() - start) * 1000
+
+        if self.reranker:
+            start = time.perf_counter()
+            reranked, step = [], 8
+            while fused and (time.perf_counter() - start) * 1000 < self.rerank_budget_ms:
+                batch, fused = fused[:step], fused[step:]
+                batch_scores = self.reranker.predict([(query, d.page_content) for d in batch])
+                reranked.extend(zip(batch_scores, batch))
+            # Scored candidates first; anything past the budget keeps fused order
+            fused = [d for _, d in sorted(reranked, key=lambda x: -x[0])] + fused
+            timings['rerank'] = (time.perf_counter() - start) * 1000
+
+        self.timings = timings
+        return fused[:k]
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+
+    def query(self, question: str, use_cache: bool = True):
         """Ask questions across all papers"""
-        answer = self.qa.run(question)
+        docs = self.hybrid_search(question, k=5)
+        chunk_ids = chunk_ids_of(docs)
+
+        answer = self.answers.get(question, chunk_ids, self.llm.model) if use_cache else None
+        if answer is None:
+            answer = self.qa.combine_documents_chain.run(input_documents=docs,
+                                                         question=question)
+            self.answers.put(question, chunk_ids, self.llm.model, answer)
         return answer
-    
+
+    def _prompt(self, question: str, docs) -> str:
+        """Same prompt the "stuff" QA chain would send"""
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return self.qa.combine_documents_chain.llm_chain.prompt.format(
+            context=context, question=question)
+
+    def query_stream(self, question: str, use_cache: bool = True, stats: dict = None):
+        """Like query, but yield answer tokens as they arrive
+
+        Time-to-first-token and tokens/s are written to the `stats` dict.
+        """
+        docs = self.hybrid_search(question, k=5)
+        chunk_ids = chunk_ids_of(docs)
+        start, first, parts = time.perf_counter(), None, []
+
+        cached = self.answers.get(question, chunk_ids, self.llm.model) if use_cache else None
+        tokens = [cached] if cached is not None else self.llm.stream(self._prompt(question, docs))
+        for token in tokens:
+            first = first or time.perf_counter()
+            parts.append(token)
+            yield token
+
+        record_stream_stats(stats, start, first, len(parts))
+        if cached is None:
+            self.answers.put(question, chunk_ids, self.llm.model, "".join(parts))
+
+    async def aquery_stream(self, question: str, use_cache: bool = True,
+                            stats: dict = None):
+        """Async iterator version of query_stream"""
+        # Retrieval is local and fast; only generation is awaited
+        docs = self.hybrid_search(question, k=5)
+        chunk_ids = chunk_ids_of(docs)
+        start, first, parts = time.perf_counter(), None, []
+
+        cached = self.answers.get(question, chunk_ids, self.llm.model) if use_cache else None
+        if cached is not None:
+            first = time.perf_counter()
+            parts.append(cached)
+            yield cached
+        else:
+            async for token in self.llm.astream(self._prompt(question, docs)):
+                first = first or time.perf_counter()
+                parts.append(token)
+                yield token
+
+        record_stream_stats(stats, start, first, len(parts))
+        if cached is None:
+            self.answers.put(question, chunk_ids, self.llm.model, "".join(parts))
+
     def find_papers_about(self, topic: str, n: int = 5):
         """Find papers discussing specific topic"""
-        docs = self.vectorstore.similarity_search(topic, k=n)
-        
+        docs = self.hybrid_search(topic, k=n)
+
         results = []
         for doc in docs:
             results.append({
                 'source': doc.metadata.get('source', 'Unknown'),
                 'excerpt': doc.page_content[:300]
             })
-        
+
         return results
 
-# Usage
-db = LiteratureDatabase('./papers')
+# Usage (guarded: parser worker processes re-import this module)
+if __name__ == "__main__":
+    db = LiteratureDatabase('./papers')
+
+    # Query across all papers
+    answer = db.query("What are common evaluation metrics for NLP tasks?")
+    print(f"Answer: {answer}\n")
 
-# Query across all papers
-answer = db.query("What are common evaluation metrics for NLP tasks?")
-print(f"Answer: {answer}\n")
+    # Stream the answer token by token
+    stats = {}
+    for token in db.query_stream("Which datasets are most often used?", stats=stats):
+        print(token, end="", flush=True)
+    print(f"\n⏱️ TTFT {stats['ttft_s']:.2f}s, "
+          f"{stats['tokens_per_s'] or 0:.1f} tokens/s\n")
 
-# Find relevant papers
-papers = db.find_papers_about("attention mechanism", n=3)
-for p in papers:
-    print(f"📄 {p['source']}\n{p['excerpt']}...\n")
\ No newline at end of file
+    # Find relevant papers
+    papers = db.find_papers_about("attention mechanism", n=3)
+    for p in papers:
+        print(f"📄 {p['source']}\n{p['excerpt']}...\n")
+    print("⏱️ " + ", ".join(f"{stage}: {ms:.0f} ms" for stage, ms in db.timings.items()))
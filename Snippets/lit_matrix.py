@@ -7,25 +7,26 @@ Difficulty: Intermediate
 Tags: RAG, Analysis, Table, Comparison
 """
 
-from langchain.llms import Ollama
-from langchain.document_loaders import PyPDFLoader
+from llm_registry import ensure_max_in_flight, get_llm
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import json
+import re
+from pdf_extract import default_cache, load_pdf_documents
 import pandas as pd
 
-def create_literature_matrix(paper_files: list, aspects: list):
-    """Create comparison matrix from multiple papers"""
-    
-    llm = Ollama(model="llama2", temperature=0.2)
+# Bump when the extraction prompt changes so cached answers are redone
+PROMPT_VERSION = 1
+
+def _extract_aspects(llm, pdf_file: str, aspects: list) -> dict:
+    """Prompt the LLM for the given aspects of one paper"""
     
-    matrix_data = []
+    # Extract paper content
+    pages = load_pdf_documents(pdf_file, pages=[0, 1, 2])
+    content = " ".join([p.page_content for p in pages])[:3000]
     
-    for pdf_file in paper_files:
-        # Extract paper content
-        loader = PyPDFLoader(pdf_file)
-        pages = loader.load()
-        content = " ".join([p.page_content for p in pages[:3]])[:3000]
-        
-        # Extract key aspects
-        prompt = f"""Extract from this paper:
+    # Extract key aspects
+    prompt = f"""Extract from this paper:
 
 {content}
 
@@ -35,18 +36,97 @@ For each aspect, provide brief answer:
 Format: Aspect: Answer (one line each)
 
 Extraction:"""
-        
-        response = llm(prompt)
-        
-        # Parse response
-        row = {'Paper': pdf_file.split('/')[-1]}
-        for line in response.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                row[key.strip()] = value.strip()
-        
-        matrix_data.append(row)
-        print(f"✓ Processed {pdf_file}")
+    
+    response = llm(prompt)
+    
+    # Parse response; aspects the model skipped are left out, so the
+    # next run asks for them again instead of caching a blank
+    wanted = {aspect.lower(): aspect for aspect in aspects}
+    values = {}
+    for line in response.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            key = re.sub(r'^\d+[.)]\s*', '', key.strip(' -*#')).strip(' *').lower()
+            if key in wanted:
+                values[wanted[key]] = value.strip()
+    
+    return values
+
+def _load_checkpoint(checkpoint: str) -> dict:
+    """Cached answers: (paper sha256, model, prompt version) -> {aspect: answer}"""
+    cache = {}
+    if not Path(checkpoint).exists():
+        return cache
+    
+    line = '\n'
+    with open(checkpoint) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            if 'sha256' not in record:
+                continue  # pre-cache checkpoint format
+            key = (record['sha256'], record['model'], record['prompt_version'])
+            cache.setdefault(key, {}).update(record['values'])
+    
+    if not line.endswith('\n'):
+        # Terminate the torn line so appended records start cleanly
+        with open(checkpoint, 'a') as f:
+            f.write('\n')
+    return cache
+
+def create_literature_matrix(paper_files: list, aspects: list, workers: int = 4,
+                             checkpoint: str = 'literature_matrix.jsonl'):
+    """Create comparison matrix from multiple papers
+    
+    Papers are processed by `workers` concurrent LLM calls (match it to the
+    Ollama server's parallel slots). Answers are appended to `checkpoint`
+    per paper content hash and aspect, so reruns resume after a crash and
+    adding an aspect only asks each paper about that new aspect.
+    """
+    
+    llm = get_llm("llama2", temperature=0.2)
+    ensure_max_in_flight(workers)
+    
+    cache = _load_checkpoint(checkpoint)
+    keys = {pdf: (default_cache().file_hash(pdf), llm.model, PROMPT_VERSION)
+            for pdf in dict.fromkeys(paper_files)}
+    todo = {pdf: [a for a in aspects if a not in cache.get(key, {})]
+            for pdf, key in keys.items()}
+    todo = {pdf: missing for pdf, missing in todo.items() if missing}
+    if len(todo) < len(keys):
+        print(f"↻ {len(keys) - len(todo)} papers fully cached")
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(checkpoint, 'a') as ckpt:
+        futures = {pool.submit(_extract_aspects, llm, pdf, missing): pdf
+                   for pdf, missing in todo.items()}
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            try:
+                values = future.result()
+            except Exception as e:
+                print(f"✗ Failed {pdf_file} ({e})")
+                continue
+            
+            sha256, model, version = keys[pdf_file]
+            ckpt.write(json.dumps({'file': pdf_file, 'sha256': sha256, 'model': model,
+                                   'prompt_version': version, 'values': values}) + '\n')
+            ckpt.flush()
+            cache.setdefault(keys[pdf_file], {}).update(values)
+            print(f"✓ Processed {pdf_file} ({len(values)}/{len(todo[pdf_file])} aspects)")
+    
+    # Rebuild the matrix from the checkpoint, in input order; aspects the
+    # model did not answer stay blank here and are asked again next run
+    matrix_data, unanswered = [], 0
+    for pdf in paper_files:
+        cached = cache.get(keys[pdf])
+        if cached:
+            unanswered += sum(aspect not in cached for aspect in aspects)
+            matrix_data.append({'Paper': pdf.split('/')[-1],
+                                **{aspect: cached.get(aspect, '') for aspect in aspects}})
+    if unanswered:
+        print(f"⚠ {unanswered} answers could not be parsed; rerun to retry them")
     
     # Create DataFrame and save
     df = pd.DataFrame(matrix_data)
@@ -64,4 +144,7 @@ Extraction:"""
 # Usage
 papers = ['paper1.pdf', 'paper2.pdf', 'paper3.pdf']
 aspects = ['Method', 'Dataset', 'Main Result', 'Limitation']
-matrix = create_literature_matrix(papers, aspects)
\ No newline at end of file
+matrix = create_literature_matrix(papers, aspects)
+
+# Adding a column only asks each paper about the new aspect
+matrix = create_literature_matrix(papers, aspects + ['Compute budget'])
\ No newline at end of file
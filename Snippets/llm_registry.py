@@ -0,0 +1,269 @@
+"""
+Title: Shared LLM Client Registry
+Subtitle: One pooled, warmed-up Ollama client per model
+Date: 2024-11-24
+Category: AI Tools
+Difficulty: Intermediate
+Tags: LLM, Ollama, Performance, Concurrency, Cache
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from langchain.llms.base import LLM
+
+def _ollama_url(host: str) -> str:
+    """Base URL from $OLLAMA_HOST, which servers often set to a bare bind
+    address ('0.0.0.0', 'host:11434'): add the scheme and default port"""
+    host = (host or '').strip().rstrip('/')
+    if host.count(':') > 1 and '[' not in host and '://' not in host:
+        host = f'[{host}]'  # bare IPv6 address
+    if '://' not in host:
+        host = 'http://' + host
+    parts = urlsplit(host)
+    hostname = parts.hostname or '127.0.0.1'
+    if hostname in ('0.0.0.0', '::'):
+        hostname = '127.0.0.1'  # bind-all address of a local server
+    if ':' in hostname:
+        hostname = f'[{hostname}]'
+    port = parts.port or (443 if parts.scheme == 'https' else 11434)
+    return f"{parts.scheme}://{hostname}:{port}{parts.path}"
+
+OLLAMA_URL = _ollama_url(os.environ.get('OLLAMA_HOST', ''))
+
+# Process-wide: one keep-alive connection pool and one cap on in-flight generations
+_max_in_flight = int(os.environ.get('LLM_MAX_IN_FLIGHT', 4))
+_semaphore = threading.BoundedSemaphore(_max_in_flight)
+_session = requests.Session()
+
+def _mount_adapters(max_in_flight: int):
+    # Enough pooled connections that every in-flight call keeps its keep-alive
+    _session.mount('http://', HTTPAdapter(pool_maxsize=2 * max_in_flight))
+    _session.mount('https://', HTTPAdapter(pool_maxsize=2 * max_in_flight))
+
+_mount_adapters(_max_in_flight)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+class ResponseCache:
+    """Persistent LRU cache of completions keyed by model, prompt and options"""
+
+    def __init__(self, path: str = 'llm_cache.sqlite', max_entries: int = 10000):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, model TEXT, response TEXT, used REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS by_used ON responses (used)")
+        self.conn.commit()
+        self.max_entries = max_entries
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()  # connection is shared by worker threads
+
+    @staticmethod
+    def key(model: str, prompt: str, options: dict) -> str:
+        return hashlib.sha256(json.dumps([model, prompt, options], sort_keys=True,
+                                         default=str).encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached response (and mark it recently used) or None"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?",
+                                    (key,)).fetchone()
+            if row:
+                self.hits += 1
+                self.conn.execute("UPDATE responses SET used = ? WHERE key = ?",
+                                  (time.time(), key))
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model: str, response: str):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                              (key, model, response, time.time()))
+            # Evict least recently used entries beyond the size bound
+            evicted = self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+            self.evictions += max(evicted, 0)
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': entries, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+# Opt-in: set $LLM_RESPONSE_CACHE to a file path or call enable_response_cache()
+_response_cache = (ResponseCache(os.environ['LLM_RESPONSE_CACHE'],
+                                 int(os.environ.get('LLM_RESPONSE_CACHE_SIZE', 10000)))
+                   if os.environ.get('LLM_RESPONSE_CACHE') else None)
+
+class PooledOllama(LLM):
+    """Ollama LLM that shares one HTTP session and the global semaphore"""
+
+    model: str = "llama2"
+    base_url: str = OLLAMA_URL
+    options: dict = {}
+    keep_alive: str = "30m"
+    use_cache: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+
+    def _call(self, prompt: str, stop=None, run_manager=None, use_cache: bool = None,
+              **kwargs) -> str:
+        options = dict(self.options, **({'stop': stop} if stop else {}))
+        cache = _response_cache
+        if cache is not None and (self.use_cache if use_cache is None else use_cache):
+            key = ResponseCache.key(self.model, prompt, options)
+            response = cache.get(key)
+            if response is None:
+                response = self._generate_text(prompt, options)
+                cache.put(key, self.model, response)
+            return response
+        return self._generate_text(prompt, options)
+
+    async def _acall(self, prompt: str, stop=None, run_manager=None, **kwargs) -> str:
+        # Blocking HTTP in a worker thread; the global semaphore still applies
+        return await asyncio.to_thread(self._call, prompt, stop, **kwargs)
+
+    def _generate_text(self, prompt: str, options: dict) -> str:
+        with _semaphore:
+            response = _session.post(f"{self.base_url}/api/generate", timeout=600, json={
+                'model': self.model,
+                'prompt': prompt,
+                'options': options,
+                'keep_alive': self.keep_alive,
+                'stream': False
+            })
+        response.raise_for_status()
+        return response.json()['response']
+
+    def warm_up(self):
+        """Load the model into server memory (an empty prompt only loads it)"""
+        _session.post(f"{self.base_url}/api/generate", timeout=600, json={
+            'model': self.model, 'keep_alive': self.keep_alive
+        }).raise_for_status()
+
+def get_llm(model: str = "llama2", warm_up: bool = False, use_cache: bool = True,
+            **options) -> PooledOllama:
+    """Shared client for `model` with sampling `options` (e.g. temperature)
+
+    With a response cache enabled, identical (model, prompt, options)
+    calls are answered from it; `use_cache=False` always generates.
+    """
+    key = (model, use_cache, tuple(sorted(options.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = PooledOllama(model=model, options=options,
+                                                  use_cache=use_cache)
+    if warm_up:
+        client.warm_up()
+    return client
+
+def set_max_in_flight(n: int):
+    """Change the cap on concurrent generations across all clients
+
+    Calls already running finish under the old cap; the connection pool
+    is resized so keep-alive is kept at the new cap.
+    """
+    global _semaphore, _max_in_flight
+    with _clients_lock:
+        _max_in_flight = n
+        _semaphore = threading.BoundedSemaphore(n)
+        _mount_adapters(n)
+
+def ensure_max_in_flight(n: int):
+    """Raise the cap to `n` if a caller asks for more parallel workers
+
+    Snippets with a `workers=` knob call this, so their throughput scales
+    with the Ollama slots the user configured (OLLAMA_NUM_PARALLEL)
+    instead of being silently capped at LLM_MAX_IN_FLIGHT.
+    """
+    if n > _max_in_flight:
+        print(f"ℹ️ Raising LLM in-flight cap from {_max_in_flight} to {n} for {n} workers")
+        set_max_in_flight(n)
+
+def enable_response_cache(path: str = 'llm_cache.sqlite', max_entries: int = 10000):
+    """Serve repeated prompts from a persistent LRU cache of `max_entries`"""
+    global _response_cache
+    _response_cache = ResponseCache(path, max_entries)
+    return _response_cache
+
+def disable_response_cache():
+    global _response_cache
+    _response_cache = None
+
+def response_cache_stats() -> dict:
+    """Hit/miss counts for this process (empty when caching is off)"""
+    return _response_cache.stats() if _response_cache is not None else {}
+
+async def run_many(afunc, calls: list, max_concurrency: int = 4, label: str = "items"):
+    """Await `afunc(**kwargs)` for every kwargs dict in `calls`
+
+    At most `max_concurrency` calls run at once. Results come back in input
+    order as {'output', 'error', 'seconds'} dicts; a failing item records
+    its exception instead of aborting the batch.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                output, error = await afunc(**kwargs), None
+            except Exception as e:
+                output, error = None, e
+            return {'output': output, 'error': error,
+                    'seconds': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(kwargs) for kwargs in calls))
+    elapsed = time.perf_counter() - start
+
+    for i, result in enumerate(results):
+        if result['error'] is not None:
+            print(f"✗ Item {i} failed ({result['error']})")
+    done = [r for r in results if r['error'] is None]
+    chars = sum(len(r['output']) for r in done if isinstance(r['output'], str))
+    print(f"✓ {len(done)}/{len(results)} {label} in {elapsed:.1f}s "
+          f"({len(results) / max(elapsed, 1e-9):.2f} {label}/s, "
+          f"{chars / max(elapsed, 1e-9):.0f} chars/s)")
+    return results
+
+def run_sync(coroutine, async_name: str):
+    """Run a batch coroutine from synchronous code
+
+    Inside a running event loop (e.g. Jupyter) asyncio.run would fail, so
+    the caller is pointed at the async variant to `await` instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    coroutine.close()
+    raise RuntimeError(f"An event loop is already running (e.g. Jupyter); "
+                       f"use `await {async_name}(...)` instead")
+
+# Usage
+if __name__ == "__main__":
+    llm = get_llm("llama2", warm_up=True, temperature=0.3)
+    assert get_llm("llama2", temperature=0.3) is llm  # same pooled client
+    print(llm("Name one classic paper on attention in one line."))
+
+    # Reruns with identical prompts skip generation entirely
+    enable_response_cache('llm_cache.sqlite', max_entries=5000)
+    for _ in range(2):
+        llm("Name one classic paper on attention in one line.")
+    print(response_cache_stats())  # {'hits': 1, 'misses': 1, ...}
+    fresh = llm("Name one classic paper on attention in one line.", use_cache=False)
@@ -7,47 +7,225 @@ Difficulty: Intermediate
 Tags: LLM, RAG, QA, Research
 """
 
-from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.llms import Ollama
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from answer_cache import AnswerCache, normalize_question
+from rag_utils import chunk_ids_of, record_stream_stats
+from pdf_extract import load_pdf_documents
 
-def setup_paper_qa(pdf_path: str):
-    """Setup RAG system for paper Q&A"""
+def _evict(cache_dir: Path, max_bytes: int, keep: Path):
+    """Delete least recently used indexes until the cache fits in `max_bytes`"""
+    entries = []
+    for entry in cache_dir.iterdir():
+        size = sum(f.stat().st_size for f in entry.rglob('*') if f.is_file())
+        entries.append((entry.stat().st_mtime, size, entry))
     
-    # Load and split PDF
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load_and_split()
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if entry != keep:
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+def setup_paper_qa(pdf_path: str, cache_dir: str = '.paper_qa_cache',
+                   max_cache_mb: int = 500, chunk_size: int = 500,
+                   chunk_overlap: int = 50, model_name: str = "all-MiniLM-L6-v2"):
+    """Setup RAG system for paper Q&A
+    
+    The FAISS index is saved under `cache_dir`, keyed by the PDF's SHA-256,
+    the chunking parameters and the embedding model, so a known paper is
+    loaded instead of re-parsed and re-embedded.
+    """
     
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(pages)
+    h = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    key = hashlib.sha256(f"{h.hexdigest()}:{chunk_size}:{chunk_overlap}:{model_name}".encode())
+    index_dir = Path(cache_dir) / key.hexdigest()[:24]
     
-    # Create vector store
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(chunks, embeddings)
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    
+    if index_dir.exists():
+        # We wrote this pickle ourselves, so deserializing it is safe
+        try:
+            vectorstore = FAISS.load_local(str(index_dir), embeddings,
+                                           allow_dangerous_deserialization=True)
+        except TypeError:  # older LangChain without the opt-in flag
+            vectorstore = FAISS.load_local(str(index_dir), embeddings)
+        os.utime(index_dir)  # mark as recently used
+        print(f"✓ Loaded cached index for {Path(pdf_path).name}")
+    else:
+        # Load (through the shared text store) and split PDF
+        pages = load_pdf_documents(pdf_path)
+        
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size,
+                                                  chunk_overlap=chunk_overlap)
+        chunks = splitter.split_documents(pages)
+        
+        # Create vector store
+        vectorstore = FAISS.from_documents(chunks, embeddings)
+        tmp_dir = index_dir.with_suffix('.tmp')
+        vectorstore.save_local(str(tmp_dir))
+        os.replace(tmp_dir, index_dir)  # never leave a half-written index
+        _evict(Path(cache_dir), max_cache_mb * 1024 * 1024, keep=index_dir)
+        
+        print(f"✓ Indexed {len(chunks)} chunks from paper")
     
     # Setup LLM (using local Ollama)
     llm = Ollama(model="llama2")
     
-    print(f"✓ Indexed {len(chunks)} chunks from paper")
-    
     return vectorstore, llm
 
-def ask_paper(question: str, vectorstore, llm):
+def _build_prompt(question: str, docs) -> str:
+    context = "\n\n".join([doc.page_content for doc in docs])
+    return f"Context from paper:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+
+def ask_paper(question: str, vectorstore, llm, cache: AnswerCache = None):
     """Ask question about the paper"""
     
     # Retrieve relevant chunks
     docs = vectorstore.similarity_search(question, k=3)
-    context = "\n\n".join([doc.page_content for doc in docs])
+    
+    # Same question over the same chunks with the same model: reuse
+    chunk_ids = chunk_ids_of(docs)
+    if cache is not None:
+        answer = cache.get(question, chunk_ids, llm.model)
+        if answer is not None:
+            return answer
     
     # Generate answer
-    prompt = f"Context from paper:\n{context}\n\nQuestion: {question}\n\nAnswer:"
-    answer = llm(prompt)
+    answer = llm(_build_prompt(question, docs))
     
+    if cache is not None:
+        cache.put(question, chunk_ids, llm.model, answer)
     return answer
 
+def ask_many(questions: list, vectorstore, llm, k: int = 3, max_parallel: int = 4,
+             cache: AnswerCache = None):
+    """Answer many questions with batched retrieval and parallel generation
+    
+    Questions are embedded in one batch, repeated questions are answered
+    once, and at most `max_parallel` generations run against the LLM
+    server at a time. Results come back in input order with timings; a
+    failed generation sets `error` (and `answer` None) without stopping
+    the others.
+    """
+    
+    start = time.perf_counter()
+    vectors = vectorstore.embeddings.embed_documents(questions)
+    embed_s = time.perf_counter() - start
+    
+    jobs = {}  # normalized question -> shared retrieval/generation job
+    results = []
+    for question, vector in zip(questions, vectors):
+        norm = normalize_question(question)
+        if norm not in jobs:
+            t0 = time.perf_counter()
+            docs = vectorstore.similarity_search_by_vector(vector, k=k)
+            jobs[norm] = {'question': question, 'docs': docs,
+                          'chunk_ids': chunk_ids_of(docs),
+                          'retrieval_s': time.perf_counter() - t0}
+        results.append({'question': question, 'job': jobs[norm]})
+    
+    def generate(job):
+        t0 = time.perf_counter()
+        job.update(answer=None, cached=False, error=None)
+        try:
+            answer = cache.get(job['question'], job['chunk_ids'], llm.model) if cache else None
+            job['cached'] = answer is not None
+            if answer is None:
+                answer = llm(_build_prompt(job['question'], job['docs']))
+                if cache is not None:
+                    cache.put(job['question'], job['chunk_ids'], llm.model, answer)
+            job['answer'] = answer
+        except Exception as e:
+            job['error'] = repr(e)
+            print(f"✗ Failed: {job['question'][:60]} ({e})")
+        job['generation_s'] = time.perf_counter() - t0
+    
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        list(pool.map(generate, jobs.values()))
+    
+    total = time.perf_counter() - start
+    failed = sum(job['error'] is not None for job in jobs.values())
+    print(f"✓ {len(questions)} questions, {len(jobs)} generations ({failed} failed), "
+          f"{len({c for j in jobs.values() for c in j['chunk_ids']})} unique chunks "
+          f"in {total:.1f}s")
+    
+    return [{'question': r['question'],
+             'answer': r['job']['answer'],
+             'cached': r['job']['cached'],
+             'error': r['job']['error'],
+             'embed_s': embed_s,
+             'retrieval_s': r['job']['retrieval_s'],
+             'generation_s': r['job']['generation_s']} for r in results]
+
+def ask_paper_stream(question: str, vectorstore, llm, cache: AnswerCache = None,
+                     stats: dict = None):
+    """Like ask_paper, but yield the answer token by token as it is generated"""
+    
+    docs = vectorstore.similarity_search(question, k=3)
+    chunk_ids = chunk_ids_of(docs)
+    start, first, parts = time.perf_counter(), None, []
+    
+    cached = cache.get(question, chunk_ids, llm.model) if cache is not None else None
+    tokens = [cached] if cached is not None else llm.stream(_build_prompt(question, docs))
+    for token in tokens:
+        first = first or time.perf_counter()
+        parts.append(token)
+        yield token
+    
+    record_stream_stats(stats, start, first, len(parts))
+    if cache is not None and cached is None:
+        cache.put(question, chunk_ids, llm.model, "".join(parts))
+
+async def aask_paper_stream(question: str, vectorstore, llm, cache: AnswerCache = None,
+                            stats: dict = None):
+    """Async iterator version of ask_paper_stream"""
+    
+    docs = await vectorstore.asimilarity_search(question, k=3)
+    chunk_ids = chunk_ids_of(docs)
+    start, first, parts = time.perf_counter(), None, []
+    
+    cached = cache.get(question, chunk_ids, llm.model) if cache is not None else None
+    if cached is not None:
+        first = time.perf_counter()
+        parts.append(cached)
+        yield cached
+    else:
+        async for token in llm.astream(_build_prompt(question, docs)):
+            first = first or time.perf_counter()
+            parts.append(token)
+            yield token
+    
+    record_stream_stats(stats, start, first, len(parts))
+    if cache is not None and cached is None:
+        cache.put(question, chunk_ids, llm.model, "".join(parts))
+
 # Usage
 vectorstore, llm = setup_paper_qa("research_paper.pdf")
-answer = ask_paper("What is the main contribution?", vectorstore, llm)
-print(answer)
\ No newline at end of file
+cache = AnswerCache('paper_qa_cache.sqlite')
+answer = ask_paper("What is the main contribution?", vectorstore, llm, cache=cache)
+print(answer)
+
+# Streaming: print tokens as they arrive
+stats = {}
+for token in ask_paper_stream("What datasets are used?", vectorstore, llm, stats=stats):
+    print(token, end="", flush=True)
+print(f"\n⏱️ TTFT {stats['ttft_s']:.2f}s, {stats['tokens_per_s'] or 0:.1f} tokens/s")
+
+# Screening: many fixed questions, shared retrieval, parallel generation
+screening = ["What is the main contribution?", "Which datasets are used?",
+             "What baselines are compared?", "What are the limitations?"]
+for r in ask_many(screening, vectorstore, llm, max_parallel=4):
+    print(f"Q: {r['question']} ({r['generation_s']:.1f}s)\nA: {(r['answer'] or r['error'])[:200]}\n")
@@ -7,13 +7,13 @@ Difficulty: Intermediate
 Tags: Agent, Review, Quality, Feedback
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 from langchain.prompts import PromptTemplate
 
 def review_paper_section(text: str, section_type: str):
     """AI reviews paper section with specific criteria"""
     
-    llm = Ollama(model="llama2", temperature=0.3)
+    llm = get_llm("llama2", temperature=0.3)
     
     criteria = {
         'abstract': ['completeness', 'clarity', 'structure', 'keywords'],
@@ -8,25 +8,154 @@ Tags: PDF, Text, Extraction, Processing
 """
 
 import PyPDF2
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_pdf_text(pdf_path: str, pages: list = None) -> str:
-    """Extract text from PDF pages"""
+class PageCache:
+    """SQLite cache of extracted page text, keyed by file SHA-256 and page"""
+
+    def __init__(self, path: str = 'pdf_text_cache.sqlite'):
+        # Generous timeout: parser worker processes may write concurrently
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL,
+                                              size INTEGER, sha256 TEXT);
+            CREATE TABLE IF NOT EXISTS docs (sha256 TEXT PRIMARY KEY, n_pages INTEGER);
+            CREATE TABLE IF NOT EXISTS pages (sha256 TEXT, page INTEGER, text TEXT,
+                                              PRIMARY KEY (sha256, page));
+        """)
+        self.lock = threading.Lock()
+
+    def file_hash(self, pdf_path: str) -> str:
+        """SHA-256 of the file, re-hashed only when its mtime or size changes"""
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.conn.execute("SELECT mtime, size, sha256 FROM files WHERE path = ?",
+                                    (path,)).fetchone()
+        if row and row[:2] == (stat.st_mtime, stat.st_size):
+            return row[2]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (path, stat.st_mtime, stat.st_size, h.hexdigest()))
+        return h.hexdigest()
+
+    def page_count(self, sha: str):
+        with self.lock:
+            row = self.conn.execute("SELECT n_pages FROM docs WHERE sha256 = ?",
+                                    (sha,)).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, sha: str, n_pages: int):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?)", (sha, n_pages))
+
+    def get(self, sha: str, pages: list) -> dict:
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT page, text FROM pages WHERE sha256 = ? "
+                f"AND page IN ({','.join('?' * len(pages))})", (sha, *pages)).fetchall()
+        return dict(rows)
+
+    def put(self, sha: str, items: list):
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                                  [(sha, page, text) for page, text in items])
+
+_default_cache = None
+
+def default_cache() -> PageCache:
+    """Process-wide shared text store (path from $PDF_TEXT_STORE)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PageCache(os.environ.get('PDF_TEXT_STORE', 'pdf_text_cache.sqlite'))
+    return _default_cache
+
+def _extract_pages(pdf_path: str, page_numbers: list) -> list:
+    """Extract a run of pages (runs in a worker process in parallel mode)"""
     with open(pdf_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
-        
-        # Extract specific pages or all
-        pages = pages or range(len(reader.pages))
-        
-        text = ""
-        for page_num in pages:
-            text += reader.pages[page_num].extract_text()
-        
-        return text
-
-# Usage - extract abstract (usually page 1)
-abstract = extract_pdf_text("paper.pdf", pages=[0])
-print(abstract[:500])  # First 500 chars
-
-# Full paper
-full_text = extract_pdf_text("paper.pdf")
-print(f"📄 Extracted {len(full_text)} characters")
\ No newline at end of file
+        return [(n, reader.pages[n].extract_text()) for n in page_numbers]
+
+def iter_pdf_text(pdf_path: str, pages: list = None, workers: int = 1,
+                  cache: PageCache = None, pages_per_task: int = 8):
+    """Yield (page_number, text) lazily, in page order
+
+    Pages found in `cache` are not parsed at all; negative page numbers
+    count from the end and out-of-range ones are skipped. With
+    `workers > 1` missing pages are extracted by a process pool in runs
+    of `pages_per_task`.
+    """
+    sha = cache.file_hash(pdf_path) if cache else None
+    n_pages = cache.page_count(sha) if cache else None
+    if n_pages is None:
+        with open(pdf_path, 'rb') as file:
+            n_pages = len(PyPDF2.PdfReader(file).pages)
+        if cache:
+            cache.set_page_count(sha, n_pages)
+
+    # Extract specific pages or all
+    pages = ([p % n_pages for p in pages if -n_pages <= p < n_pages]
+             if pages is not None else list(range(n_pages)))
+    cached = cache.get(sha, pages) if cache and pages else {}
+    missing = [p for p in dict.fromkeys(pages) if p not in cached]
+
+    if missing and workers > 1:
+        runs = [missing[i:i + pages_per_task] for i in range(0, len(missing), pages_per_task)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = pool.map(_extract_pages, [pdf_path] * len(runs), runs)
+            batches = iter(extracted)
+            for page in pages:
+                while page not in cached:
+                    batch = next(batches)
+                    cached.update(batch)
+                    if cache:
+                        cache.put(sha, batch)
+                yield page, cached[page]
+        return
+
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file) if missing else None
+        for page in pages:
+            if page not in cached:
+                cached[page] = reader.pages[page].extract_text()
+                if cache:
+                    cache.put(sha, [(page, cached[page])])
+            yield page, cached[page]
+
+def extract_pdf_text(pdf_path: str, pages: list = None, workers: int = 1,
+                     cache: PageCache = None) -> str:
+    """Extract text from PDF pages"""
+    return "".join(text for _, text in iter_pdf_text(pdf_path, pages, workers, cache))
+
+def load_pdf_documents(pdf_path: str, pages: list = None, cache: PageCache = None):
+    """Drop-in for PyPDFLoader(pdf_path).load() that reads through the text store"""
+    from langchain.schema import Document
+
+    cache = cache or default_cache()
+    return [Document(page_content=text, metadata={'source': pdf_path, 'page': page})
+            for page, text in iter_pdf_text(pdf_path, pages, cache=cache)]
+
+# Usage (guarded: parallel mode re-imports this module in worker processes)
+if __name__ == "__main__":
+    cache = default_cache()
+
+    # Extract abstract (usually page 1) - a cache hit on every later run
+    abstract = extract_pdf_text("paper.pdf", pages=[0], cache=cache)
+    print(abstract[:500])  # First 500 chars
+
+    # Full paper, pages parsed in parallel; page 0 comes from the cache
+    full_text = extract_pdf_text("paper.pdf", workers=4, cache=cache)
+    print(f"📄 Extracted {len(full_text)} characters")
+
+    # Stream pages without holding the whole document
+    for page_number, text in iter_pdf_text("paper.pdf", cache=cache):
+        print(f"  page {page_number + 1}: {len(text)} chars")
@@ -7,13 +7,13 @@ Difficulty: Beginner
 Tags: Prompts, LLM, Library, Reusable
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 from langchain.prompts import PromptTemplate
 import json
 
 class ResearchPromptLibrary:
     def __init__(self):
-        self.llm = Ollama(model="llama2")
+        self.llm = get_llm("llama2")
         self.prompts = {
             'summarize': """Summarize this research text in 3 bullet points:
 {text}
@@ -8,14 +8,10 @@ Difficulty: Beginner
 Tags: LLM, Research, Questions, Planning
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm, run_many, run_sync
 from langchain.prompts import PromptTemplate
 
-def generate_research_questions(topic: str, context: str = ""):
-    """Generate research questions for a topic"""
-    
-    llm = Ollama(model="llama2", temperature=0.8)
-    
+def _questions_prompt(topic: str, context: str) -> str:
     template = """You are a research advisor helping formulate research questions.
 
 Topic: {topic}
@@ -41,7 +37,14 @@ Research Questions:"""
         input_variables=["topic", "context"]
     )
     
-    questions = llm(prompt.format(topic=topic, context=context))
+    return prompt.format(topic=topic, context=context)
+
+def generate_research_questions(topic: str, context: str = ""):
+    """Generate research questions for a topic"""
+    
+    llm = get_llm("llama2", temperature=0.8)
+    
+    questions = llm(_questions_prompt(topic, context))
     
     # Save to file
     with open('research_questions.md', 'w') as f:
@@ -53,9 +56,50 @@ Research Questions:"""
     
     return questions
 
+async def agenerate_research_questions(topic: str, context: str = ""):
+    """Async counterpart of generate_research_questions (no file, no printing)"""
+    llm = get_llm("llama2", temperature=0.8)
+    return await llm.ainvoke(_questions_prompt(topic, context))
+
+async def agenerate_research_questions_many(topics: list, contexts: list = None,
+                                            max_concurrency: int = 4,
+                                            output_file: str = 'research_questions.md'):
+    """Research questions for many topics, `max_concurrency` at a time
+    
+    Returns one {'output', 'error', 'seconds'} dict per topic, in input
+    order; successful topics are written as sections of `output_file`.
+    """
+    contexts = contexts or [""] * len(topics)
+    calls = [{'topic': topic, 'context': context}
+             for topic, context in zip(topics, contexts, strict=True)]
+    results = await run_many(agenerate_research_questions, calls,
+                             max_concurrency, label="topics")
+    
+    with open(output_file, 'w') as f:
+        for topic, result in zip(topics, results):
+            if result['error'] is None:
+                f.write(f"# Research Questions: {topic}\n\n{result['output']}\n\n")
+    
+    return results
+
+def generate_research_questions_many(topics: list, contexts: list = None,
+                                     max_concurrency: int = 4,
+                                     output_file: str = 'research_questions.md'):
+    """Blocking agenerate_research_questions_many (await that one inside Jupyter)"""
+    return run_sync(agenerate_research_questions_many(topics, contexts, max_concurrency,
+                                                      output_file),
+                    "agenerate_research_questions_many")
+
 # Usage
 questions = generate_research_questions(
     topic="Efficient Transformers for Mobile Devices",
     context="Current transformers are too large for edge deployment. "
             "There's growing need for on-device AI capabilities."
-)
\ No newline at end of file
+)
+
+# Many topics at once, written to one markdown file
+results = generate_research_questions_many(
+    topics=["Federated Learning for Healthcare", "Neural Code Search",
+            "Low-Resource Machine Translation"],
+    max_concurrency=4
+)
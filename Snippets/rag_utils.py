@@ -0,0 +1,39 @@
+"""
+Title: RAG Helpers
+Subtitle: Stable chunk IDs and streaming stats shared by the RAG snippets
+Date: 2024-11-24
+Category: AI Tools
+Difficulty: Beginner
+Tags: RAG, LLM, Streaming, Utilities
+"""
+
+import hashlib
+import time
+
+def record_stream_stats(stats: dict, start: float, first: float, n_tokens: int):
+    """Fill `stats` (if given) with time-to-first-token and decode speed"""
+    if stats is None:
+        return
+    total = time.perf_counter() - start
+    ttft = first - start if first else None
+    decode = total - ttft if ttft is not None else 0
+    # Streamed chunks; Ollama sends roughly one token per chunk
+    stats.update(ttft_s=ttft, tokens=n_tokens, total_s=total,
+                 tokens_per_s=(n_tokens - 1) / decode if decode > 0 else None)
+
+def chunk_ids_of(docs) -> list:
+    """Stable IDs for retrieved documents (stored chunk_id or content hash)"""
+    return [doc.metadata.get('chunk_id')
+            or hashlib.sha256(doc.page_content.encode()).hexdigest()[:16]
+            for doc in docs]
+
+# Usage
+if __name__ == "__main__":
+    from langchain.schema import Document
+
+    print(chunk_ids_of([Document(page_content="Attention is all you need.")]))
+
+    stats, start = {}, time.perf_counter()
+    first = time.perf_counter()
+    record_stream_stats(stats, start, first, n_tokens=42)
+    print(stats)
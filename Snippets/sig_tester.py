@@ -7,13 +7,13 @@ Difficulty: Intermediate
 Tags: LLM, Statistics, Significance, Analysis
 """
 
-from langchain.llms import Ollama
+from llm_registry import get_llm
 import pandas as pd
 
 def check_result_significance(results: dict, baseline: dict):
     """Check if improvement is significant"""
     
-    llm = Ollama(model="llama2", temperature=0.1)
+    llm = get_llm("llama2", temperature=0.1)
     
     prompt = f"""Analyze if this improvement is statistically significant:
 
@@ -45,7 +45,7 @@ Analysis:"""
 def suggest_statistical_test(experiment_design: str):
     """Suggest appropriate statistical test"""
     
-    llm = Ollama(model="llama2", temperature=0.2)
+    llm = get_llm("llama2", temperature=0.2)
     
     prompt = f"""Suggest appropriate statistical test:
 